@@ -23,3 +23,8 @@ for package in $(comm -13 <(comm -23 <(pacman -Qqe | sort) <({ pacman -Qqg base-
     echo "Removing $package from packages.vurf"
   fi
 done
+
+# Fold journaled changes into packages.vurf so they show up in version control
+if [[ -z $DRY_RUN ]]; then
+  vurf format
+fi
@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+"""
+Cost of `Root.to_string` on a large manifest before and after a single edit
+and of `Vurf.format` after a single edit or save compared to formatting from the file.
+
+Usage: python benchmarks/save.py [sections] [packages per section]
+"""
+import io
+import sys
+import tempfile
+import timeit
+
+from pathlib import Path
+
+from vurf import Vurf
+from vurf.parser import parse
+from vurf.types import Config
+
+
+def manifest(sections: int, packages: int) -> str:
+    lines = []
+    for section in range(sections):
+        lines.append(f"with section{section}:")
+        for package in range(packages):
+            if package % 10 == 0:
+                lines.append(f"  if condition{package}:")
+            lines.append(f"    package{section}-{package}  # comment")
+    return "\n".join(lines) + "\n"
+
+
+def main(sections: int = 100, packages: int = 1000) -> None:
+    root = parse(io.StringIO(manifest(sections, packages)))
+    full = timeit.timeit(root.to_string, number=1)
+    cached = timeit.timeit(root.to_string, number=1)
+    root.add_package("section0", "new-package")
+    edited = timeit.timeit(root.to_string, number=1)
+    print(f"{sections} sections x {packages} packages")
+    print(f"full render:            {full * 1000:8.2f} ms")
+    print(f"unchanged:              {cached * 1000:8.2f} ms")
+    print(f"after single edit:      {edited * 1000:8.2f} ms")
+    with tempfile.TemporaryDirectory() as directory:
+        path = Path(directory) / "packages.vurf"
+        path.write_text(root.to_string())
+        vurf = Vurf.from_path(path, Config(str(path), "section0", {}, {}))
+        vurf.to_string()
+        vurf.add("another-package")
+        loaded = timeit.timeit(vurf.format, number=1)
+        vurf.add("third-package")
+        vurf.save()
+        saved = timeit.timeit(vurf.format, number=1)
+        vurf.add("fourth-package")
+        vurf.save()
+        # Like `vurf format` of the CLI, without a loaded tree
+        parsed = timeit.timeit(vurf._get_journal().compact, number=1)
+    print(f"format loaded tree:     {loaded * 1000:8.2f} ms")
+    print(f"format after save:      {saved * 1000:8.2f} ms")
+    print(f"format from file:       {parsed * 1000:8.2f} ms")
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,84 @@
+import io
+
+import pytest
+
+import vurf.parser
+
+from vurf.backends import BACKENDS, Backend, PipBackend, get_backend
+from vurf.types import Section
+
+
+PACKAGES = """with python:
+  Click==8.0.0
+  lark
+with other:
+  first
+  second
+"""
+
+
+class RecordingBackend(Backend):
+    calls: list[tuple[str, list[str]]] = []
+
+    def install(self, packages):
+        self.calls.append((self.section.name, packages))
+
+    def list_installed(self):
+        return ["first"]
+
+
+@pytest.fixture
+def root():
+    return vurf.parser.parse(io.StringIO(PACKAGES))
+
+
+@pytest.fixture
+def recording(monkeypatch):
+    monkeypatch.setitem(BACKENDS, "recording", RecordingBackend)
+    monkeypatch.setattr(RecordingBackend, "calls", [])
+    return RecordingBackend
+
+
+def test_backend_receives_whole_section(root, recording):
+    sections = {
+        "python": Section("python", backend="recording"),
+        "other": Section("other", backend="recording"),
+    }
+    root.install(None, sections, {})
+    assert recording.calls == [("python", ["Click==8.0.0", "lark"]), ("other", ["first", "second"])]
+    assert root.plan("other", sections, {}) == {"other": ["second"]}
+
+
+def test_shell_backend(root, tmp_path):
+    log = tmp_path / "log"
+    command = f"sh -c 'echo $* >> {log}' command"
+    sections = {
+        "python": Section("python", install=command, sequential=False),
+        "other": Section("other", uninstall=command, sequential=True),
+    }
+    root.install("python", sections, {})
+    root.uninstall("other", sections, {})
+    assert log.read_text().splitlines() == ["Click==8.0.0 lark", "first", "second"]
+    assert root.plan("python", sections, {}) == {"python": ["Click==8.0.0", "lark"]}
+
+
+def test_pip_backend_plan(monkeypatch):
+    backend = get_backend(Section("python", backend="pip"))
+    assert isinstance(backend, PipBackend)
+    monkeypatch.setattr(backend, "list_installed", lambda: ["click"])
+    assert backend.plan(["Click==8.0.0", "lark"]) == ["lark"]
+
+
+def test_pip_backend_interpreter():
+    assert get_backend(Section("venv", backend="pip", python="/venv/bin/python")).command == [
+        "/venv/bin/python",
+        "-m",
+        "pip",
+    ]
+    with pytest.raises(ValueError):
+        get_backend(Section("venv", install="pip install --user", backend="pip"))
+
+
+def test_unknown_backend():
+    with pytest.raises(ValueError):
+        get_backend(Section("python", backend="unknown"))
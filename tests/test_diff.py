@@ -0,0 +1,67 @@
+import io
+
+from pathlib import Path
+
+import pytest
+
+import vurf.parser
+
+from vurf.diff import READERS, diff, missing
+
+
+@pytest.fixture
+def root():
+    with open(Path(__file__).parent / "basic.vurf") as f:
+        return vurf.parser.parse(f)
+
+
+def test_readers():
+    brewfile = ['tap "homebrew/core"\n', 'brew "git"\n', 'mas "Xcode", id: 497799835\n']
+    assert list(READERS["brewfile"].read(brewfile)) == [
+        ("tap", "homebrew/core"),
+        ("brew", "git"),
+        ("mas", "497799835"),
+    ]
+    requirements = ["# comment\n", "-r other.txt\n", "Click==8.0.0  # pinned\n", "lark @ https://x\n"]
+    assert list(READERS["requirements"].read(requirements)) == [("pip", "Click"), ("pip", "lark")]
+    cargo = ["ripgrep v13.0.0:\n", "    rg\n"]
+    assert list(READERS["cargo"].read(cargo)) == [("cargo", "ripgrep")]
+    assert list(READERS["apt"].read(["git\n", "\n"])) == [("apt", "git")]
+
+
+def test_diff(root):
+    freeze = ["Pip_Package==1.0\n", "package3==2.0\n", "new-package==0.1\n"]
+    differences = list(diff(root, freeze, READERS["pip-freeze"], {}, {"cond1": "Cond2", "cond2": True}))
+    assert len(differences) == 1
+    assert differences[0].missing_in_vurf == ["new-package"]
+    assert differences[0].missing_in_manifest == []
+    assert list(missing(differences, root, READERS["pip-freeze"])) == [("pip", "new-package")]
+
+
+def test_missing_skips_packages_under_false_conditions(root):
+    freeze = ["package3==2.0\n", "new-package==0.1\n", "new_package==0.1\n"]
+    differences = list(diff(root, freeze, READERS["pip-freeze"], {}, {"cond1": "", "yyy": False}))
+    assert differences[0].missing_in_vurf == ["new-package", "package3"]
+    assert list(missing(differences, root, READERS["pip-freeze"])) == [("pip", "new-package")]
+
+
+def test_missing_compares_by_reader_key():
+    root = vurf.parser.parse(io.StringIO("with pip:\n  if cond:\n    pip-package\n  else:\n    other\n"))
+    freeze = ["Pip_Package==1.0\n", "Other==2.0\n"]
+    for cond, spelled in [(False, "Pip_Package"), (True, "Other")]:
+        differences = list(diff(root, freeze, READERS["pip-freeze"], {}, {"cond": cond}))
+        assert differences[0].missing_in_vurf == [spelled]
+        # Spelled differently under a false condition, adding it would duplicate the package
+        assert list(missing(differences, root, READERS["pip-freeze"])) == []
+
+
+def test_diff_mappings(root):
+    brewfile = ['brew "ax"\n', 'brew "pip-package"\n', 'tap "homebrew/core"\n']
+    mappings = {"brew": ["paru", "pip", "unknown"]}
+    parameters = {"sometest": True, "cond1": "", "yyy": False}
+    differences = list(diff(root, brewfile, READERS["brewfile"], mappings, parameters))
+    brew, tap = differences
+    assert brew.vurf_sections == ["paru", "pip"]
+    assert brew.missing_in_vurf == []
+    assert "package3" in brew.missing_in_manifest
+    assert tap.vurf_sections == []
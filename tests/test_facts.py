@@ -0,0 +1,85 @@
+import io
+import json
+import os
+import time
+
+import pytest
+
+from vurf import Vurf
+from vurf.facts import Facts, using
+from vurf.parser import parse
+from vurf.types import Config
+
+
+class Counter:
+    def __init__(self, value):
+        self.value = value
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return self.value
+
+
+def test_facts_are_collected_lazily_once():
+    os_, arch = Counter("linux"), Counter("x86_64")
+    facts = Facts({"os": os_, "arch": arch})
+    assert facts.os == "linux"
+    assert facts.os == "linux"
+    assert (os_.calls, arch.calls) == (1, 0)
+    with pytest.raises(AttributeError):
+        facts.unknown
+
+
+def test_snapshot(tmp_path):
+    snapshot = tmp_path / "facts.json"
+    first = Counter("linux")
+    assert Facts({"os": first}, snapshot).os == "linux"
+    assert json.loads(snapshot.read_text()) == {"os": "linux"}
+    second = Counter("darwin")
+    assert Facts({"os": second}, snapshot).os == "linux"
+    assert second.calls == 0
+    # Stale snapshot is gathered again
+    stale = time.time() - 120
+    os.utime(snapshot, (stale, stale))
+    assert Facts({"os": second}, snapshot, ttl=60).os == "darwin"
+    assert Facts({"os": second}, snapshot).gather(refresh=True) == {"os": "darwin"}
+    assert second.calls == 2
+
+
+def test_unwritable_snapshot(tmp_path):
+    # Parent of the snapshot is a file
+    (tmp_path / "file").write_text("")
+    counter = Counter("linux")
+    facts = Facts({"os": counter}, tmp_path / "file" / "facts.json")
+    assert facts.os == "linux"
+    assert facts.os == "linux"
+    assert counter.calls == 1
+
+
+def test_failing_collector_gives_none(tmp_path):
+    def user():
+        raise KeyError("getpwuid(): uid not found")
+
+    facts = Facts({"os": lambda: "linux", "user": user}, tmp_path / "facts.json")
+    assert facts.os == "linux"
+    assert facts.user is None
+    assert facts.gather() == {"os": "linux", "user": None}
+
+
+PACKAGES = 'with pip:\n  if facts.os == "linux":\n    linux\n  else:\n    other\n'
+
+
+def test_conditions_see_facts():
+    root = parse(io.StringIO(PACKAGES))
+    with using(Facts({"os": lambda: "linux"})):
+        assert list(root.get_packages("pip", {})) == ["linux"]
+    with using(Facts({"os": lambda: "darwin"})):
+        assert list(root.get_packages("pip", {})) == ["other"]
+
+
+def test_vurf_instances_keep_their_facts():
+    vurf = Vurf.from_string(PACKAGES, Config("", "pip", {}, {}))
+    vurf._facts = Facts({"os": lambda: "linux"})
+    Vurf.from_string(PACKAGES, Config("", "pip", {}, {}))
+    assert vurf.packages() == ["linux"]
@@ -0,0 +1,47 @@
+import io
+
+import vurf.parser
+
+from vurf.history import BATCH, History
+from vurf.types import Section
+
+
+def test_record_and_save(tmp_path):
+    path = tmp_path / "history.json"
+    history = History(path)
+    history.record("pip", "torch", 10.0)
+    history.record("pip", "torch", 20.0)
+    assert history.expected("pip", "torch") == 15.0
+    other = History(path)
+    other.record("pip", "lark", 1.0)
+    other.save()
+    history.save()
+    assert History(path).expected("pip", "torch") == 15.0
+    assert History(path).expected("pip", "lark") == 1.0
+
+
+def test_schedule_and_estimate():
+    history = History()
+    for package, seconds in [("small", 1.0), ("medium", 3.0), ("large", 5.0)]:
+        history.record("pip", package, seconds)
+    packages = ["small", "unknown", "large", "medium"]
+    # Unknown package takes average time and keeps its place among equal ones
+    assert history.schedule("pip", packages) == ["large", "unknown", "medium", "small"]
+    estimate = history.estimate("pip", packages, jobs=2, batch=False)
+    assert estimate.seconds == 6.0
+    assert estimate.critical_path in (["large", "small"], ["unknown", "medium"])
+    assert estimate.durations["unknown"] is None
+    history.record("brew", BATCH, 30.0)
+    assert history.estimate("brew", ["a", "b"], jobs=1, batch=True).seconds == 30.0
+
+
+def test_parallel_install_records_durations(tmp_path):
+    log = tmp_path / "log"
+    root = vurf.parser.parse(io.StringIO("with pip:\n  fast\n  slow\n  other\n"))
+    history = History()
+    history.record("pip", "slow", 100.0)
+    section = Section("pip", install=f"sh -c 'echo $1 >> {log}' install", sequential=True, jobs=2)
+    root.install(None, {"pip": section}, {}, history)
+    assert sorted(log.read_text().splitlines()) == ["fast", "other", "slow"]
+    assert history.expected("pip", "fast") is not None
+    assert history.expected("pip", "slow") < 100.0
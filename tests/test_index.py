@@ -0,0 +1,56 @@
+from pathlib import Path
+
+import pytest
+
+from vurf.index import Index
+from vurf.journal import ADD, REMOVE, Journal
+
+
+@pytest.fixture
+def journal(tmp_path):
+    packages = tmp_path / "packages.vurf"
+    packages.write_text((Path(__file__).parent / "basic.vurf").read_text())
+    return Journal(packages, threshold=100)
+
+
+def test_index_contains_packages_regardless_of_conditions(journal):
+    index = journal.index()
+    assert list(index.get_sections()) == ["paru", "pip"]
+    assert "pkg2333" in index.get_all_packages("paru")
+    assert "pkg2" in index.get_all_packages("pip")
+    assert Index.read(journal.index_path, journal.fingerprint()).sections == index.sections
+
+
+def test_index_is_updated_on_append_without_parsing(journal, monkeypatch):
+    journal.index()
+
+    def fail():
+        raise AssertionError("parsed")
+
+    monkeypatch.setattr(journal, "_parse", fail)
+    journal.append([(ADD, "pip", "new-package"), (REMOVE, "paru", "arandr")])
+    index = journal.index()
+    assert "new-package" in index.get_all_packages("pip")
+    assert "arandr" not in index.get_all_packages("paru")
+
+
+def test_index_is_rebuilt_when_stale(journal):
+    journal.index()
+    journal.packages_location.write_text("with other:\n  package\n")
+    assert list(journal.index().get_sections()) == ["other"]
+
+
+@pytest.mark.parametrize(
+    "text, entries",
+    [
+        ("with a:\n  x\n  if c:\n    x\n", [(REMOVE, "a", "x")]),
+        ("with a:\n  if c:\n    y\n  else:\n    x\n", [(ADD, "a", "x"), (REMOVE, "a", "x")]),
+        ("with a:\n  if c:\n    y\n  else:\n    x\n", [(REMOVE, "a", "x")]),
+        ("with a:\n  x\n  y\n", [(REMOVE, "a", "x")]),
+    ],
+)
+def test_index_matches_tree_after_remove(journal, text, entries):
+    journal.packages_location.write_text(text)
+    journal.index()
+    journal.append(entries)
+    assert journal.index().sections == Index.from_root(journal.load()).sections
@@ -0,0 +1,56 @@
+from pathlib import Path
+
+import pytest
+
+from vurf.journal import ADD, REMOVE, REMOVE_SECTION, Journal
+
+
+@pytest.fixture
+def journal(tmp_path):
+    packages = tmp_path / "packages.vurf"
+    packages.write_text((Path(__file__).parent / "simple.vurf").read_text())
+    return Journal(packages, threshold=3)
+
+
+def test_load_replays_entries(journal):
+    formatted = journal.packages_location.read_text()
+    journal.append([(ADD, "paru", "new-package"), (REMOVE, "paru", "package")])
+    assert journal.packages_location.read_text() == formatted
+    assert list(journal.load().get_packages("paru", {"sometest": True})) == ["new-package"]
+
+
+def test_concurrent_writers_do_not_lose_packages(journal):
+    other = Journal(journal.packages_location, journal.threshold)
+    journal.append([(ADD, "paru", "first")])
+    other.append([(ADD, "paru", "second")])
+    assert list(journal.load().get_packages("paru", {"sometest": False})) == ["first", "second"]
+
+
+def test_compact(journal):
+    journal.append([(ADD, "paru", "new-package")])
+    root, fingerprint = journal.compact()
+    assert fingerprint == journal.fingerprint()
+    assert journal.entries() == []
+    assert journal.packages_location.read_text() == root.to_string()
+    assert root.has_package("paru", "new-package")
+
+
+def test_record_compacts_past_threshold(journal):
+    journal.record([(ADD, "paru", f"package{i}") for i in range(3)])
+    assert len(journal.entries()) == 3
+    journal.record([(ADD, "paru", "package3")])
+    assert journal.entries() == []
+    assert "package3" in journal.packages_location.read_text()
+
+
+def test_replay_skips_removed_sections(journal):
+    journal.append([(REMOVE_SECTION, "paru"), (ADD, "paru", "package"), ["unknown"]])
+    with journal.path.open("a") as f:
+        f.write('["add", "pa')
+    assert list(journal.load().get_sections()) == []
+
+
+def test_append_after_torn_line(journal):
+    journal.path.write_text('["add", "paru", "tor')
+    assert journal.append([(ADD, "paru", "y")]) == 2
+    assert journal.entries() == [(ADD, "paru", "y")]
@@ -0,0 +1,114 @@
+from dataclasses import replace
+from pathlib import Path
+
+import pytest
+
+from vurf import Vurf
+from vurf.journal import Journal
+from vurf.types import Config
+
+
+PACKAGES = (Path(__file__).parent / "basic.vurf").read_text()
+
+
+@pytest.fixture
+def config():
+    return Config("", "paru", {}, {"sometest": True})
+
+
+def test_from_string(config):
+    vurf = Vurf.from_string(PACKAGES, config)
+    assert "package3" in vurf.packages("paru")
+    assert "pkg2333" not in vurf.packages("paru")
+    assert vurf.has("package3", "paru", resolved=True)
+    assert not vurf.has("pkg2333", "paru", resolved=True)
+    assert vurf.package_section("package3", resolved=True) == "paru"
+    vurf.add("new-package")
+    assert vurf.has("new-package", "paru")
+    with pytest.raises(ValueError):
+        vurf.save()
+
+
+def test_from_string_ignores_packages_location(tmp_path, config):
+    path = tmp_path / "packages.vurf"
+    path.write_text(PACKAGES)
+    vurf = Vurf.from_string("with paru:\n  package\n", replace(config, packages_location=str(path)))
+    vurf.add("new-package")
+    with pytest.raises(ValueError):
+        vurf.save()
+    with pytest.raises(ValueError):
+        vurf.reload()
+    assert vurf.packages() == ["package", "new-package"]
+    assert not (tmp_path / "packages.vurf.journal").exists()
+
+
+def test_from_path(tmp_path, config):
+    path = tmp_path / "packages.vurf"
+    path.write_text(PACKAGES)
+    vurf = Vurf.from_path(path, config)
+    vurf.add("new-package")
+    vurf.save()
+    assert Vurf.from_path(path, config).has("new-package")
+
+
+def test_reload_parses_only_changed_file(tmp_path, config):
+    path = tmp_path / "packages.vurf"
+    path.write_text(PACKAGES)
+    vurf = Vurf.from_path(path, config)
+    root = vurf._root
+    vurf.reload()
+    assert vurf._root is root
+    vurf.add("new-package")
+    vurf.reload()
+    assert not vurf.has("new-package")
+    Vurf.from_path(path, config).remove("arandr")
+    vurf.reload()
+    assert vurf.has("arandr")
+    other = Vurf.from_path(path, config)
+    other.remove("arandr")
+    other.save()
+    vurf.reload()
+    assert not vurf.has("arandr")
+
+
+def test_format_renders_loaded_tree(tmp_path, config):
+    path = tmp_path / "packages.vurf"
+    path.write_text(PACKAGES)
+    vurf = Vurf.from_path(path, config)
+    root = vurf._root
+    vurf.add("new-package")
+    vurf.format()
+    assert vurf._root is root
+    assert path.read_text() == root.to_string()
+    # Changed files are parsed again and unsaved changes are kept
+    vurf.add("another-package")
+    other = Vurf.from_path(path, config)
+    other.add("other-package")
+    other.save()
+    vurf.format()
+    assert vurf._root is not root
+    formatted = Vurf.from_path(path, config)
+    assert all(formatted.has(p) for p in ["new-package", "another-package", "other-package"])
+
+
+@pytest.mark.parametrize("threshold", [100, 1])
+def test_own_writes_dont_reparse(tmp_path, config, monkeypatch, threshold):
+    path = tmp_path / "packages.vurf"
+    path.write_text(PACKAGES)
+    vurf = Vurf.from_path(path, replace(config, packages_location=str(path), journal_threshold=threshold))
+    vurf.to_string()
+
+    def fail(self):
+        raise AssertionError("Parsed again")
+
+    monkeypatch.setattr(Journal, "_parse", fail)
+    vurf.add("new-package")
+    vurf.format()
+    vurf.add("another-package")
+    vurf.format()
+    vurf.add("third-package")
+    vurf.save()
+    vurf.reload()
+    vurf.format()
+    monkeypatch.undo()
+    assert Vurf.from_path(path, config).to_string() == vurf.to_string()
@@ -0,0 +1,66 @@
+import io
+import stat
+
+import pytest
+
+import vurf.parser
+
+from vurf.prefetch import cache_location
+from vurf.types import Section
+
+
+PACKAGES = """with pip:
+  first
+  broken
+  third
+"""
+
+
+@pytest.fixture(autouse=True)
+def prefetch_location(tmp_path, monkeypatch):
+    location = tmp_path / "prefetch"
+    monkeypatch.setattr("vurf.prefetch.prefetch_location", lambda: location)
+    return location
+
+
+def _install(tmp_path, sequential):
+    log = tmp_path / "log"
+    section = Section(
+        "pip",
+        install=f"sh -c 'echo install {{cache}} $* >> {log}' install",
+        sequential=sequential,
+        prefetch=f"sh -c 'test $1 != broken && echo prefetch $1 >> {log}' prefetch",
+        prefetch_jobs=2,
+    )
+    root = vurf.parser.parse(io.StringIO(PACKAGES))
+    root.install(None, {"pip": section}, {})
+    return log.read_text().splitlines(), cache_location(section)
+
+
+def test_prefetch_sequential(tmp_path):
+    lines, cache = _install(tmp_path, sequential=True)
+    assert [line for line in lines if line.startswith("install")] == [
+        f"install {cache} first",
+        f"install {cache} broken",
+        f"install {cache} third",
+    ]
+    for package in ("first", "third"):
+        assert lines.index(f"prefetch {package}") < lines.index(f"install {cache} {package}")
+    assert "prefetch broken" not in lines
+
+
+def test_prefetch_batch(tmp_path):
+    lines, cache = _install(tmp_path, sequential=False)
+    assert lines[-1] == f"install {cache} first broken third"
+    assert sorted(lines[:-1]) == ["prefetch first", "prefetch third"]
+
+
+def test_cache_location_is_private(prefetch_location):
+    (prefetch_location / "pip").mkdir(parents=True, mode=0o777)
+    (prefetch_location / "pip").chmod(0o777)
+    cache = cache_location(Section("pip"))
+    assert cache == prefetch_location / "pip"
+    assert stat.S_IMODE(cache.stat().st_mode) == 0o700
+    (prefetch_location / "link").symlink_to(cache)
+    with pytest.raises(PermissionError):
+        cache_location(Section("link"))
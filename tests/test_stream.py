@@ -0,0 +1,106 @@
+import io
+
+from pathlib import Path
+
+import pytest
+
+from vurf.journal import ADD, REMOVE, Journal, replay
+from vurf.parser import parse
+from vurf.parser.stream import stream_packages, streamable
+
+
+FILES = ["simple.vurf", "basic.vurf", "ellipses.vurf", "quoted.vurf", "conditionals.vurf"]
+PARAMETERS = [
+    {},
+    {"sometest": True, "cond1": True, "x": 1, "day": "good"},
+    {"sometest": False, "cond2": "Cond2", "y": 0, "you_excited": True},
+]
+
+
+@pytest.mark.parametrize("name", FILES)
+@pytest.mark.parametrize("parameters", PARAMETERS)
+def test_stream_matches_tree(name, parameters):
+    text = (Path(__file__).parent / name).read_text()
+    root = parse(io.StringIO(text))
+    for section in [None, *root.get_sections()]:
+        try:
+            expected = list(root.get_packages(section, parameters))
+        except NameError:
+            # Conditions using parameters this case doesn't set
+            continue
+        assert list(stream_packages(io.StringIO(text), parameters, section)) == expected
+
+
+def test_stream_applies_entries():
+    text = (Path(__file__).parent / "simple.vurf").read_text()
+    entries = [(ADD, "paru", "new-package"), (REMOVE, "paru", "package"), (ADD, "paru", "package")]
+    root = parse(io.StringIO(text))
+    replay(root, entries)
+    parameters = {"sometest": True}
+    assert streamable(io.StringIO(text), entries)
+    assert list(stream_packages(io.StringIO(text), parameters, "paru", entries)) == list(
+        root.get_packages("paru", parameters)
+    )
+
+
+@pytest.mark.parametrize(
+    "text, entries",
+    [
+        # Tree removes only the direct copy, and `add` finds the nested one
+        ("with a:\n  x\n  if c:\n    x\n", [(REMOVE, "a", "x")]),
+        ("with a:\n  x\n  if c:\n    x\n", [(REMOVE, "a", "x"), (ADD, "a", "x")]),
+        # Tree keeps only the last of repeated sections
+        ("with a:\n  x\nwith a:\n  y\n", []),
+    ],
+)
+def test_journal_stream_falls_back_to_tree(tmp_path, text, entries):
+    packages = tmp_path / "packages.vurf"
+    packages.write_text(text)
+    journal = Journal(packages, threshold=10)
+    journal.append(entries)
+    assert not streamable(io.StringIO(text), entries)
+    for parameters in [{"c": True}, {"c": False}]:
+        expected = list(journal.load().get_packages("a", parameters))
+        assert list(journal.stream(parameters, "a")) == expected
+
+
+def test_stream_inline_body_and_errors():
+    assert list(stream_packages(["with pip: package\n", "with brew:\n", "  other\n"], {})) == [
+        "package",
+        "other",
+    ]
+    with pytest.raises(KeyError):
+        list(stream_packages(["with pip:\n", "  package\n"], {}, "brew"))
+    with pytest.raises(ValueError, match="Line 2"):
+        list(stream_packages(["with pip:\n", "package\n"], {}))
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "with pip:  # comment\n  a\n",
+        "with pip:# comment\n  a\n",
+        "with pip:\n  if c:  # comment\n    a\n",
+        "with pip:\n  if c:\n    a\n  else:  # comment\n    b\n",
+        "with pip: a  # comment\n",
+        "with pip:\n  # comment\n  if c: a  # comment\n  else: b\n",
+    ],
+)
+def test_stream_accepts_what_grammar_accepts(text, capsys):
+    try:
+        expected = list(parse(io.StringIO(text)).get_packages(None, {"c": True}))
+    except SystemExit:
+        with pytest.raises(ValueError):
+            list(stream_packages(io.StringIO(text), {"c": True}))
+    else:
+        assert list(stream_packages(io.StringIO(text), {"c": True})) == expected
+
+
+def test_journal_stream(tmp_path):
+    packages = tmp_path / "packages.vurf"
+    packages.write_text((Path(__file__).parent / "simple.vurf").read_text())
+    journal = Journal(packages, threshold=10)
+    journal.append([(ADD, "paru", "new-package")])
+    assert list(journal.stream({"sometest": True}, "paru")) == list(
+        journal.load().get_packages("paru", {"sometest": True})
+    )
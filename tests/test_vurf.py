@@ -1,3 +1,5 @@
+import io
+
 from pathlib import Path
 
 import pytest
@@ -74,3 +76,68 @@ def test_conditionals():
     assert basic.data == "basic == 0"
     assert multi.data == "one == 1 and something_else"
     assert function.data == "pathlib.Path('~/some-file').exists()"
+
+
+def test_snapshot():
+    root = parse("basic.vurf")
+    snapshot = root.snapshot()
+    formatted = snapshot.to_string()
+    root.add_package("pip", "package4")
+    root.remove_package("paru", "arandr")
+    root.remove_section("pip")
+    assert snapshot.to_string() == formatted
+    assert snapshot.has_package("pip", "pip-package")
+    assert not root.has_package("paru", "arandr")
+    with pytest.raises(TypeError):
+        snapshot.add_package("paru", "package4")
+
+
+def test_snapshot_shares_unchanged_sections():
+    root = parse("basic.vurf")
+    snapshot = root.snapshot()
+    root.add_package("pip", "package4")
+    assert root._sections["paru"] is snapshot._sections["paru"]
+    assert root._sections["pip"] is not snapshot._sections["pip"]
+
+
+def test_render_cache_is_invalidated():
+    root = parse("basic.vurf")
+    root.to_string()
+    root.add_package("pip", "nested", 1)
+    root.remove_package("pip", "package3")
+    formatted = root.to_string()
+    assert "    nested" in formatted
+    assert not root.has_package("pip", "package3")
+    assert "package3" in formatted  # only removed from pip
+    assert formatted == vurf.parser.parse(io.StringIO(formatted)).to_string()
+
+
+@pytest.mark.parametrize(
+    "parameters",
+    [
+        {"sometest": True, "cond1": "Cond2", "cond2": True, "xxx": False, "yyy": False},
+        {"sometest": False, "cond1": "COnd3", "cond2": False, "xxx": True, "yyy": True},
+        {"sometest": False, "cond1": "", "cond2": False, "xxx": False, "yyy": True},
+    ],
+)
+def test_resolved_membership_matches_get_packages(parameters):
+    root = parse("basic.vurf")
+    for section in root.get_sections():
+        resolved = set(root.get_packages(section, parameters))
+        for package in root.get_all_packages(section):
+            assert root.has_resolved_package(section, package, parameters) == (package in resolved)
+    for package in root.get_all_packages(None):
+        expected = next((s for s in root.get_sections() if package in root.get_packages(s, parameters)), None)
+        assert root.get_resolved_package_section(package, parameters) == expected
+
+
+def test_resolved_membership_evaluates_only_its_path():
+    root = vurf.parser.parse(
+        io.StringIO("with pip:\n  if 1 / 0:\n    other\n  if first:\n    package\n  else:\n    package\n")
+    )
+    # Condition of the unrelated branch would raise
+    assert root.has_resolved_package("pip", "package", {"first": False})
+    assert not root.has_resolved_package(None, "missing", {})
+    assert not root.has_package("pip", "missing")
+    root.add_package("pip", "missing")
+    assert root.get_resolved_package_section("missing", {}) == "pip"
@@ -0,0 +1,40 @@
+import sys
+
+from importlib.metadata import entry_points
+from typing import Optional, Type
+
+from vurf.backends.base import Backend
+from vurf.backends.pip import PipBackend
+from vurf.backends.shell import ShellBackend
+from vurf.history import History
+from vurf.types import Section
+
+
+__all__ = ["Backend", "PipBackend", "ShellBackend", "get_backend"]
+
+ENTRY_POINT_GROUP = "vurf.backends"
+
+BACKENDS: dict[str, Type[Backend]] = {
+    "shell": ShellBackend,
+    "pip": PipBackend,
+}
+
+
+def _load_entry_point(name: str) -> Type[Backend]:
+    if sys.version_info >= (3, 10):
+        found = list(entry_points(group=ENTRY_POINT_GROUP, name=name))
+    else:
+        found = [entry for entry in entry_points().get(ENTRY_POINT_GROUP, []) if entry.name == name]
+    if not found:
+        raise ValueError(f"Unknown backend {name}")
+    return found[0].load()
+
+
+def get_backend(section: Section, history: Optional[History] = None) -> Backend:
+    """
+    Returns backend selected by `backend` attribute of the section.
+    Built-in backends are looked up first, then the `vurf.backends` entry point group.
+    """
+    if section.backend not in BACKENDS:
+        BACKENDS[section.backend] = _load_entry_point(section.backend)
+    return BACKENDS[section.backend](section, history)
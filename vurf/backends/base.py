@@ -0,0 +1,52 @@
+import time
+
+from contextlib import contextmanager
+from typing import Iterable, Iterator, Optional
+
+from vurf.history import BATCH, History
+from vurf.types import Section
+
+
+class Backend:
+    """
+    Installs and uninstalls packages of one section.
+
+    Backends receive the whole resolved list of packages of the section.
+    `install`, `uninstall` and `list_installed` have to be implemented,
+    `plan` defaults to packages that are not installed yet.
+    Install durations can be recorded to `history` with `timed`.
+    """
+
+    def __init__(self, section: Section, history: Optional[History] = None) -> None:
+        self.section = section
+        self.history = history
+
+    @property
+    def sequential(self) -> bool:
+        """True if packages are installed one by one, False if in one batch."""
+        return False
+
+    @contextmanager
+    def timed(self, package: str = BATCH) -> Iterator[None]:
+        """Records duration of the block as install duration of `package`, defaults to the whole batch."""
+        start = time.monotonic()
+        yield
+        if self.history is not None:
+            self.history.record(self.section.name, package, time.monotonic() - start)
+
+    def install(self, packages: list[str]) -> None:
+        raise NotImplementedError
+
+    def uninstall(self, packages: list[str]) -> None:
+        raise NotImplementedError
+
+    def list_installed(self) -> Iterable[str]:
+        raise NotImplementedError
+
+    def plan(self, packages: list[str]) -> list[str]:
+        """Returns packages that `install` would install."""
+        try:
+            installed = set(self.list_installed())
+        except NotImplementedError:
+            return packages
+        return [package for package in packages if package not in installed]
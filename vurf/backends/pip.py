@@ -0,0 +1,50 @@
+import json
+import subprocess
+import sys
+
+from typing import Iterable, Optional
+
+from vurf.backends.base import Backend
+from vurf.history import History
+from vurf.lib import expand_path, requirement_name, unquote
+from vurf.types import Section
+
+
+class PipBackend(Backend):
+    """
+    Resolves and installs all packages of the section in a single pip invocation.
+    Uses pip of the section's `python`, defaults to the interpreter running vurf.
+    """
+
+    def __init__(self, section: Section, history: Optional[History] = None) -> None:
+        default = Section(section.name)
+        if (section.install, section.uninstall) != (default.install, default.uninstall):
+            # Silently installing somewhere else than the commands say would be worse
+            raise ValueError(
+                f"Section {section.name} uses pip backend which ignores `install` and `uninstall`,"
+                " set `python` to choose the interpreter"
+            )
+        super().__init__(section, history)
+        python = str(expand_path(section.python)) if section.python else sys.executable
+        self.command = [python, "-m", "pip"]
+
+    def install(self, packages: list[str]) -> None:
+        if packages:
+            with self.timed():
+                subprocess.run([*self.command, "install", *map(unquote, packages)], check=True)
+
+    def uninstall(self, packages: list[str]) -> None:
+        if packages:
+            subprocess.run(
+                [*self.command, "uninstall", "--yes", *map(requirement_name, packages)], check=True
+            )
+
+    def list_installed(self) -> Iterable[str]:
+        output = subprocess.run(
+            [*self.command, "list", "--format=json"], check=True, capture_output=True, text=True
+        ).stdout
+        return [requirement_name(package["name"]) for package in json.loads(output)]
+
+    def plan(self, packages: list[str]) -> list[str]:
+        installed = set(self.list_installed())
+        return [package for package in packages if requirement_name(package) not in installed]
@@ -0,0 +1,59 @@
+import subprocess
+import threading
+
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from typing import Iterable
+
+from vurf.backends.base import Backend
+from vurf.prefetch import prefetched, with_cache
+
+
+class ShellBackend(Backend):
+    """
+    Runs `install` and `uninstall` shell commands of the section.
+    Sequential sections with `jobs` > 1 install packages in parallel, longest expected first.
+    """
+
+    @property
+    def sequential(self) -> bool:
+        return self.section.sequential
+
+    def _run_one(self, command: str, package: str, record: bool) -> None:
+        with self.timed(package) if record else nullcontext():
+            subprocess.run(f"{command} {package}", shell=True)
+
+    def _run_parallel(self, command: str, packages: Iterable[str], record: bool) -> None:
+        slots = threading.BoundedSemaphore(self.section.jobs)
+        with ThreadPoolExecutor(max_workers=self.section.jobs) as executor:
+            for package in packages:
+                # Don't pull more packages (and prefetches) than there are free workers
+                slots.acquire()
+                future = executor.submit(self._run_one, command, package, record)
+                future.add_done_callback(lambda _: slots.release())
+
+    def _run(self, command: str, packages: Iterable[str], record: bool = False) -> None:
+        if self.section.sequential and self.section.jobs > 1:
+            self._run_parallel(command, packages, record)
+        elif self.section.sequential:
+            for package in packages:
+                self._run_one(command, package, record)
+        else:
+            with self.timed() if record else nullcontext():
+                subprocess.run(f"{command} {' '.join(packages)}", shell=True)
+
+    def install(self, packages: list[str]) -> None:
+        if self.section.sequential and self.section.jobs > 1 and self.history is not None:
+            packages = self.history.schedule(self.section.name, packages)
+        if self.section.prefetch:
+            # Consumed lazily so installs overlap with prefetches of the following packages
+            self._run(
+                with_cache(self.section.install, self.section),
+                prefetched(self.section, packages),
+                record=True,
+            )
+        else:
+            self._run(self.section.install, packages, record=True)
+
+    def uninstall(self, packages: list[str]) -> None:
+        self._run(self.section.uninstall, packages)
@@ -1,15 +1,19 @@
 import sys
 
-from functools import wraps
+from functools import cached_property, wraps
 from types import SimpleNamespace
 from typing import Callable, Iterable, Optional
 
 import click
 
-from vurf.constants import APP_NAME, CONFIG_NAME
-from vurf.lib import ensure_config, expand_path
+from vurf.backends import get_backend
+from vurf.constants import APP_NAME
+from vurf.diff import READERS, diff, missing
+from vurf.facts import Facts, current, use
+from vurf.history import BATCH, History
+from vurf.journal import ADD, REMOVE, Journal
+from vurf.lib import config_location, ensure_config, expand_path, history_location, load_config
 from vurf.nodes import Root
-from vurf.parser import parse
 from vurf.types import Config
 
 
@@ -18,19 +22,58 @@ SECTION_ENV = f"{APP_NAME}_SECTION"
 
 class HintedObject(SimpleNamespace):
     config: Config
-    root: Root
+    journal: Journal
     quit: bool
 
+    @cached_property
+    def root(self) -> Root:
+        # Commands that stream packages never build the tree
+        return self.journal.load()
+
 
 class HintedContext(SimpleNamespace):
     obj: HintedObject
 
 
+def _completion_journal() -> Optional[Journal]:
+    # Completion must not create config files nor print anything
+    config_file = config_location()
+    if not config_file.is_file():
+        return None
+    config = load_config(config_file)
+    return Journal(expand_path(config.packages_location), config.journal_threshold)
+
+
+def complete_sections(ctx: click.Context, param: click.Parameter, incomplete: str) -> list[str]:
+    try:
+        journal = _completion_journal()
+        if journal is None:
+            return []
+        return [section for section in journal.index().get_sections() if section.startswith(incomplete)]
+    except Exception:
+        return []
+
+
+def complete_packages(ctx: click.Context, param: click.Parameter, incomplete: str) -> list[str]:
+    try:
+        journal = _completion_journal()
+        if journal is None:
+            return []
+        section = ctx.params.get("section")
+        if section is None and ctx.command.name == "remove":
+            section = load_config(config_location()).default_section
+        packages = journal.index().get_all_packages(section)
+        return [package for package in dict.fromkeys(packages) if package.startswith(incomplete)]
+    except Exception:
+        return []
+
+
 defaul_section_option = click.option(
     "-s",
     "--section",
     required=False,
     envvar=SECTION_ENV,
+    shell_complete=complete_sections,
     help=f"Defaults to `default_section` from config. Reads {SECTION_ENV} env variable.",
 )
 all_sections_option = click.option(
@@ -38,8 +81,14 @@ all_sections_option = click.option(
     "--section",
     required=False,
     envvar=SECTION_ENV,
+    shell_complete=complete_sections,
     help=f"Defaults to all sections. Reads {SECTION_ENV} env variable.",
 )
+resolved_option = click.option(
+    "--resolved",
+    is_flag=True,
+    help="Only packages that conditions include on this host.",
+)
 separator_option = click.option(
     "--separator",
     required=False,
@@ -49,9 +98,29 @@ separator_option = click.option(
 )
 
 
-def write_packages(ctx: HintedContext):
-    with expand_path(ctx.obj.config.packages_location).open("w") as f:
-        f.write(ctx.obj.root.to_string())
+def _seconds(seconds: Optional[float]) -> str:
+    return "?" if seconds is None else f"{seconds:.1f}s"
+
+
+def print_plan(ctx: HintedContext, section: Optional[str], history: History) -> None:
+    sections = ctx.obj.config.sections
+    total = 0.0
+    for section_name, packages in ctx.obj.root.plan(section, sections, ctx.obj.config.parameters).items():
+        config_section = sections[section_name]
+        batch = not get_backend(config_section).sequential
+        estimate = history.estimate(section_name, packages, config_section.jobs, batch)
+        total += estimate.seconds
+        jobs = "batch" if batch else f"{config_section.jobs} job(s)"
+        click.echo(f"{section_name}: {len(packages)} package(s), {jobs}, ~{_seconds(estimate.seconds)}")
+        if batch:
+            click.echo(f"  {_seconds(estimate.durations[BATCH]):>8}  {' '.join(packages)}")
+            continue
+        for package in estimate.order:
+            # Packages on the critical path are highlighted
+            fg = "yellow" if package in estimate.critical_path else None
+            click.secho(f"  {_seconds(estimate.durations[package]):>8}  {package}", fg=fg)
+        click.echo(f"  critical path: {' -> '.join(estimate.critical_path)}")
+    click.echo(f"Estimated total: ~{_seconds(total)}")
 
 
 def no_traceback(f: Callable) -> Callable:
@@ -74,12 +143,12 @@ def no_traceback(f: Callable) -> Callable:
 @no_traceback
 def main(ctx, quiet):
     config = ensure_config(quiet)
-    with expand_path(config.packages_location).open() as f:
-        root = parse(f)
-    ctx.obj = ctx.ensure_object(SimpleNamespace)
+    journal = Journal(expand_path(config.packages_location), config.journal_threshold)
+    ctx.obj = ctx.ensure_object(HintedObject)
     ctx.obj.config = config
-    ctx.obj.root = root
+    ctx.obj.journal = journal
     ctx.obj.quiet = quiet
+    use(Facts.from_config(config))
 
 
 # Root -> get_sections
@@ -93,7 +162,7 @@ def sections(ctx: HintedContext, separator: str):
 
 # Root -> has_section
 @main.command(help="Exit with indication if section is in sections.")
-@click.argument("section")
+@click.argument("section", shell_complete=complete_sections)
 @click.pass_context
 @no_traceback
 def has_section(ctx: HintedContext, section: str):
@@ -107,26 +176,40 @@ def has_section(ctx: HintedContext, section: str):
 @click.pass_context
 @no_traceback
 def packages(ctx: HintedContext, section: Optional[str], separator: str):
-    click.echo(separator.join(ctx.obj.root.get_packages(section, ctx.obj.config.parameters)))
+    # Written as resolved, large files are never held in memory
+    for index, package in enumerate(ctx.obj.journal.stream(ctx.obj.config.parameters, section)):
+        if index:
+            sys.stdout.write(separator)
+        sys.stdout.write(package)
+    sys.stdout.write("\n")
 
 
 # Root -> has_package
 @main.command(help="Exit with indication if package is in packages.")
 @all_sections_option
-@click.argument("package")
+@resolved_option
+@click.argument("package", shell_complete=complete_packages)
 @click.pass_context
 @no_traceback
-def has(ctx: HintedContext, section: Optional[str], package: str):
-    sys.exit(int(not ctx.obj.root.has_package(section, package)))
+def has(ctx: HintedContext, section: Optional[str], resolved: bool, package: str):
+    if resolved:
+        found = ctx.obj.root.has_resolved_package(section, package, ctx.obj.config.parameters)
+    else:
+        found = ctx.obj.root.has_package(section, package)
+    sys.exit(int(not found))
 
 
 # Root -> get_package_section
 @main.command(help="Print the first section that contains the package.")
+@resolved_option
 @click.pass_context
-@click.argument("package")
+@click.argument("package", shell_complete=complete_packages)
 @no_traceback
-def package_section(ctx: HintedContext, package: str):
-    section = ctx.obj.root.get_package_section(package)
+def package_section(ctx: HintedContext, resolved: bool, package: str):
+    if resolved:
+        section = ctx.obj.root.get_resolved_package_section(package, ctx.obj.config.parameters)
+    else:
+        section = ctx.obj.root.get_package_section(package)
     if section is None:
         sys.exit(1)
     click.echo(section)
@@ -141,32 +224,41 @@ def package_section(ctx: HintedContext, package: str):
 def add(ctx: HintedContext, section: Optional[str], packages: Iterable[str]):
     if section is None:
         section = ctx.obj.config.default_section
-    for package in packages:
-        ctx.obj.root.add_package(section, package)
-    write_packages(ctx)
+    # Index is kept fresh by appends, so adding doesn't parse the packages file
+    if not ctx.obj.journal.index().has_section(section):
+        raise KeyError(section)
+    ctx.obj.journal.record((ADD, section, package) for package in packages)
 
 
 # Root -> remove_package
 @main.command(help="Remove package(s).")
 @defaul_section_option
-@click.argument("packages", nargs=-1)
+@click.argument("packages", nargs=-1, shell_complete=complete_packages)
 @click.pass_context
 @no_traceback
 def remove(ctx: HintedContext, section: Optional[str], packages: Iterable[str]):
     if section is None:
         section = ctx.obj.config.default_section
-    for package in packages:
-        ctx.obj.root.remove_package(section, package)
-    write_packages(ctx)
+    if not ctx.obj.journal.index().has_section(section):
+        raise KeyError(section)
+    ctx.obj.journal.record((REMOVE, section, package) for package in packages)
 
 
 # Root -> install
 @main.command(help="Install packages.")
 @all_sections_option
+@click.option("--plan", is_flag=True, help="Print estimated schedule and time without installing.")
 @click.pass_context
 @no_traceback
-def install(ctx: HintedContext, section: Optional[str]):
-    click.echo(ctx.obj.root.install(section, ctx.obj.config.sections, ctx.obj.config.parameters))
+def install(ctx: HintedContext, section: Optional[str], plan: bool):
+    history = History(history_location())
+    if plan:
+        print_plan(ctx, section, history)
+        return
+    try:
+        click.echo(ctx.obj.root.install(section, ctx.obj.config.sections, ctx.obj.config.parameters, history))
+    finally:
+        history.save()
 
 
 # Root -> uninstall
@@ -178,6 +270,52 @@ def uninstall(ctx: HintedContext, section: Optional[str]):
     click.echo(ctx.obj.root.uninstall(section, ctx.obj.config.sections, ctx.obj.config.parameters))
 
 
+@main.command(name="diff", help="Compare packages with external manifest.")
+@click.argument("manifest_format", metavar="FORMAT", type=click.Choice(list(READERS)))
+@click.argument("manifest", type=click.File(), default="-")
+@click.option("--apply", is_flag=True, help="Add packages missing in packages file.")
+@click.pass_context
+@no_traceback
+def diff_(ctx: HintedContext, manifest_format: str, manifest, apply: bool):
+    differences = list(
+        diff(
+            ctx.obj.root,
+            manifest,
+            READERS[manifest_format],
+            ctx.obj.config.mappings,
+            ctx.obj.config.parameters,
+        )
+    )
+    if apply:
+        packages = missing(differences, ctx.obj.root, READERS[manifest_format])
+        entries = [(ADD, section, package) for section, package in packages]
+        for _, section, package in entries:
+            ctx.obj.root.add_package(section, package)
+        # Single batched write
+        ctx.obj.journal.record(entries)
+        if not ctx.obj.quiet:
+            click.echo(f"Added {len(entries)} package(s).")
+        return
+    for difference in differences:
+        if not difference.vurf_sections:
+            if not ctx.obj.quiet:
+                click.secho(f"{difference.section} -> no matching section", fg="bright_black", err=True)
+            continue
+        click.echo(f"{difference.section} -> {', '.join(difference.vurf_sections)}")
+        for package in difference.missing_in_vurf:
+            click.secho(f"+ {package}", fg="green")
+        for package in difference.missing_in_manifest:
+            click.secho(f"- {package}", fg="red")
+
+
+@main.command(help="Print facts about this host available to conditions as `facts`.")
+@click.option("--refresh", is_flag=True, help="Gather facts again even if the snapshot is fresh.")
+@no_traceback
+def facts(refresh: bool):
+    for name, value in current().gather(refresh).items():
+        click.echo(f"{name} = {value!r}")
+
+
 @main.command(help="Print default section.")
 @click.pass_context
 @no_traceback
@@ -189,20 +327,22 @@ def default(ctx):
 @click.pass_context
 @no_traceback
 def format(ctx):
-    write_packages(ctx)
+    ctx.obj.journal.compact()
 
 
 @main.command(help="Edit packages file.")
 @click.pass_context
 @no_traceback
 def edit(ctx):
+    # Pending entries would be replayed over the edited file
+    ctx.obj.journal.compact()
     click.edit(filename=str(expand_path(ctx.obj.config.packages_location)))
 
 
 @main.command(help="Edit config file.")
 @no_traceback
 def config():
-    click.edit(filename=f"{click.get_app_dir(APP_NAME)}/{CONFIG_NAME}")
+    click.edit(filename=str(config_location()))
 
 
 if __name__ == "__main__":
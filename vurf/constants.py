@@ -1,2 +1,4 @@
 APP_NAME = "VURF"
 CONFIG_NAME = "config.toml"
+HISTORY_NAME = "history.json"
+PREFETCH_NAME = "prefetch"
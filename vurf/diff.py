@@ -0,0 +1,142 @@
+import re
+
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Callable, Iterable, Iterator
+
+from vurf.lib import REQUIREMENT_NAME, requirement_name, unquote
+from vurf.nodes import COMMENT, Root
+from vurf.types import Mappings, Parameters
+
+
+Package = tuple[str, str]
+
+QUOTED = re.compile(r"""^\s*(\w+)\s+["']([^"']+)["'](.*)$""")
+MAS_ID = re.compile(r"id:\s*(\d+)")
+
+
+def _strip(line: str) -> str:
+    if COMMENT in line:
+        line = line[: line.index(COMMENT)]
+    return line.strip()
+
+
+def requirements_reader(lines: Iterable[str]) -> Iterator[Package]:
+    """`requirements.txt` and `pip freeze`."""
+    for line in lines:
+        line = _strip(line)
+        # Skip options like `-r other.txt` or `--index-url`
+        if not line or line.startswith("-"):
+            continue
+        match = REQUIREMENT_NAME.match(line)
+        if match:
+            yield "pip", match.group(1)
+
+
+def brewfile_reader(lines: Iterable[str]) -> Iterator[Package]:
+    """`brew bundle dump`."""
+    for line in lines:
+        match = QUOTED.match(line)
+        if not match:
+            continue
+        section, name, rest = match.groups()
+        if section == "mas":
+            ids = MAS_ID.findall(rest)
+            if ids:
+                name = ids[0]
+        yield section, name
+
+
+def cargo_reader(lines: Iterable[str]) -> Iterator[Package]:
+    """`cargo install --list`."""
+    for line in lines:
+        # Installed binaries are indented under the crate
+        if line.strip() and not line[0].isspace():
+            yield "cargo", line.split()[0]
+
+
+def apt_reader(lines: Iterable[str]) -> Iterator[Package]:
+    """`apt-mark showmanual`."""
+    for line in lines:
+        line = _strip(line)
+        if line:
+            yield "apt", line
+
+
+@dataclass
+class Reader:
+    read: Callable[[Iterable[str]], Iterator[Package]]
+    # Comparison key of a package name on both sides
+    key: Callable[[str], str] = unquote
+
+
+READERS = {
+    "requirements": Reader(requirements_reader, requirement_name),
+    "pip-freeze": Reader(requirements_reader, requirement_name),
+    "brewfile": Reader(brewfile_reader),
+    "cargo": Reader(cargo_reader),
+    "apt": Reader(apt_reader),
+}
+
+
+@dataclass
+class Difference:
+    section: str
+    vurf_sections: list[str]
+    missing_in_vurf: list[str]
+    missing_in_manifest: list[str]
+
+
+def diff(
+    root: Root,
+    lines: Iterable[str],
+    reader: Reader,
+    mappings: Mappings,
+    parameters: Parameters,
+) -> Iterator[Difference]:
+    """
+    Compares packages of an external manifest read line by line with packages in `root`.
+    Manifest section maps to vurf sections from `mappings`, defaults to the section of the same name.
+    Sections without a matching vurf section have empty `vurf_sections`.
+    """
+    manifest: dict[str, dict[str, str]] = defaultdict(dict)
+    for section, name in reader.read(lines):
+        manifest[section].setdefault(reader.key(name), name)
+    resolved: dict[str, dict[str, str]] = {}
+    for section, packages in manifest.items():
+        vurf_sections = [s for s in mappings.get(section, [section]) if root.has_section(s)]
+        if not vurf_sections:
+            yield Difference(section, [], [], [])
+            continue
+        vurf_packages: dict[str, str] = {}
+        for vurf_section in vurf_sections:
+            if vurf_section not in resolved:
+                resolved[vurf_section] = {
+                    reader.key(name): name for name in root.get_packages(vurf_section, parameters)
+                }
+            vurf_packages.update(resolved[vurf_section])
+        yield Difference(
+            section,
+            vurf_sections,
+            sorted(packages[key] for key in packages.keys() - vurf_packages.keys()),
+            sorted(vurf_packages[key] for key in vurf_packages.keys() - packages.keys()),
+        )
+
+
+def missing(differences: Iterable[Difference], root: Root, reader: Reader) -> Iterator[Package]:
+    """
+    Packages missing in vurf paired with the first mapped vurf section.
+    Packages already in the section under any condition are skipped, compared by `reader.key`.
+    """
+    listed: dict[str, set[str]] = {}
+    for difference in differences:
+        if not difference.vurf_sections:
+            continue
+        section = difference.vurf_sections[0]
+        if section not in listed:
+            listed[section] = {reader.key(name) for name in root.get_all_packages(section)}
+        for name in difference.missing_in_vurf:
+            key = reader.key(name)
+            if key not in listed[section]:
+                listed[section].add(key)
+                yield section, name
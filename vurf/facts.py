@@ -0,0 +1,209 @@
+import getpass
+import json
+import os
+import platform
+import shutil
+import socket
+import threading
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager, suppress
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Callable, Iterator, Optional
+
+from vurf.lib import expand_path
+from vurf.types import Config
+
+
+# Executables reported in `facts.toolchains`
+TOOLCHAINS = [
+    "apt",
+    "brew",
+    "cargo",
+    "dnf",
+    "flatpak",
+    "gcc",
+    "go",
+    "java",
+    "node",
+    "npm",
+    "pacman",
+    "paru",
+    "pip3",
+    "rustc",
+    "snap",
+    "yay",
+]
+OS_RELEASE = Path("/etc/os-release")
+
+
+def _os_release() -> dict[str, str]:
+    try:
+        lines = OS_RELEASE.read_text().splitlines()
+    except OSError:
+        return {}
+    release = {}
+    for line in lines:
+        key, _, value = line.partition("=")
+        if value:
+            release[key.strip()] = value.strip().strip("\"'")
+    return release
+
+
+def _distro() -> Optional[str]:
+    if platform.system() == "Darwin":
+        return "macos"
+    return _os_release().get("ID")
+
+
+def _distro_version() -> Optional[str]:
+    if platform.system() == "Darwin":
+        return platform.mac_ver()[0]
+    return _os_release().get("VERSION_ID")
+
+
+def _toolchains() -> dict[str, Optional[str]]:
+    return {name: shutil.which(name) for name in TOOLCHAINS}
+
+
+COLLECTORS: dict[str, Callable[[], Any]] = {
+    "os": lambda: platform.system().lower(),
+    "arch": platform.machine,
+    "hostname": socket.gethostname,
+    "kernel": platform.release,
+    "distro": _distro,
+    "distro_version": _distro_version,
+    "python": platform.python_version,
+    "user": getpass.getuser,
+    "cpus": os.cpu_count,
+    "toolchains": _toolchains,
+}
+
+
+class Facts:
+    """
+    Facts about the host available to conditions as `facts`, e.g. `facts.os == "linux"`.
+
+    Each fact is collected lazily at most once, a failing collector gives `None`.
+    With `snapshot` all facts are gathered in parallel on first use and saved,
+    the snapshot is reused until it is older than `ttl` seconds.
+    """
+
+    def __init__(
+        self,
+        collectors: Optional[dict[str, Callable[[], Any]]] = None,
+        snapshot: Optional[Path] = None,
+        ttl: float = 3600,
+    ) -> None:
+        self._collectors = COLLECTORS if collectors is None else collectors
+        self._snapshot = snapshot
+        self._ttl = ttl
+        self._values: dict[str, Any] = {}
+        self._loaded = snapshot is None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config: Config) -> "Facts":
+        snapshot = expand_path(config.facts_snapshot) if config.facts_snapshot else None
+        return cls(snapshot=snapshot, ttl=config.facts_ttl)
+
+    def _read(self) -> dict[str, Any]:
+        snapshot = self._snapshot
+        try:
+            if snapshot is None or time.time() - snapshot.stat().st_mtime > self._ttl:
+                return {}
+            with snapshot.open() as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write(self) -> None:
+        snapshot = self._snapshot
+        if snapshot is None:
+            return
+        temporary = snapshot.with_name(f".{snapshot.name}.{os.getpid()}.tmp")
+        try:
+            snapshot.parent.mkdir(parents=True, exist_ok=True)
+            with temporary.open("w") as f:
+                json.dump(self._values, f, indent=2)
+            os.replace(temporary, snapshot)
+        except OSError:
+            # Snapshot is only a cache, gathered facts stay in memory
+            with suppress(OSError):
+                temporary.unlink()
+
+    def _collect(self, name: str) -> Any:
+        try:
+            return self._collectors[name]()
+        except Exception:
+            # E.g. `getpass.getuser` without a passwd entry, other facts stay usable
+            return None
+
+    def _gather(self, refresh: bool = False) -> None:
+        # Called with the lock held
+        if refresh:
+            self._values = {}
+        elif not self._loaded:
+            self._values = {k: v for k, v in self._read().items() if k in self._collectors}
+        missing = [name for name in self._collectors if name not in self._values]
+        if missing:
+            with ThreadPoolExecutor(max_workers=len(missing)) as executor:
+                values = executor.map(self._collect, missing)
+                self._values.update(zip(missing, values))
+            self._write()
+        self._loaded = True
+
+    def gather(self, refresh: bool = False) -> dict[str, Any]:
+        """Returns all facts, collectors run in parallel. `refresh` ignores the snapshot."""
+        with self._lock:
+            self._gather(refresh)
+            return dict(self._values)
+
+    def __getattr__(self, name: str) -> Any:
+        if name.startswith("_") or name not in self._collectors:
+            raise AttributeError(f"Unknown fact {name}")
+        with self._lock:
+            if name not in self._values:
+                if self._loaded:
+                    self._values[name] = self._collect(name)
+                else:
+                    # Snapshot is read or rebuilt as a whole
+                    self._gather()
+            return self._values[name]
+
+    def __dir__(self) -> list[str]:
+        return list(self._collectors)
+
+
+_default: Optional[Facts] = None
+# Facts of the `Vurf` instance evaluating conditions in this thread
+_current: ContextVar[Optional[Facts]] = ContextVar("facts", default=None)
+
+
+def current() -> Facts:
+    """Facts seen by conditions, defaults to facts shared by the whole process."""
+    global _default
+    facts = _current.get()
+    if facts is not None:
+        return facts
+    if _default is None:
+        _default = Facts()
+    return _default
+
+
+def use(facts: Facts) -> None:
+    """Replaces facts shared by the whole process, used by the CLI."""
+    global _default
+    _default = facts
+
+
+@contextmanager
+def using(facts: Facts) -> Iterator[None]:
+    """Conditions evaluated inside see `facts`, other threads are not affected."""
+    token = _current.set(facts)
+    try:
+        yield
+    finally:
+        _current.reset(token)
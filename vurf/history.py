@@ -0,0 +1,103 @@
+import heapq
+import json
+import os
+import threading
+
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+
+# Key of the duration of a whole batch install, package names cannot be empty
+BATCH = ""
+
+Durations = dict[str, dict[str, float]]
+
+
+@dataclass
+class Estimate:
+    order: list[str]
+    durations: dict[str, Optional[float]]
+    critical_path: list[str]
+    seconds: float
+
+
+class History:
+    """
+    Install durations in seconds measured on this host.
+
+    Durations are averaged with the previous run and merged with the file on `save`
+    so concurrent installs don't overwrite each other.
+    """
+
+    def __init__(self, path: Optional[Path] = None) -> None:
+        self.path = path
+        self._durations = self._read()
+        self._recorded: Durations = {}
+        self._lock = threading.Lock()
+
+    def _read(self) -> Durations:
+        if self.path is None:
+            return {}
+        try:
+            with self.path.open() as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def expected(self, section_name: str, package: str) -> Optional[float]:
+        return self._durations.get(section_name, {}).get(package)
+
+    def record(self, section_name: str, package: str, seconds: float) -> None:
+        with self._lock:
+            previous = self.expected(section_name, package)
+            if previous is not None:
+                seconds = (previous + seconds) / 2
+            self._durations.setdefault(section_name, {})[package] = seconds
+            self._recorded.setdefault(section_name, {})[package] = seconds
+
+    def save(self) -> None:
+        if self.path is None or not self._recorded:
+            return
+        durations = self._read()
+        for section_name, recorded in self._recorded.items():
+            durations.setdefault(section_name, {}).update(recorded)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        temporary = self.path.with_name(f".{self.path.name}.{os.getpid()}.tmp")
+        with temporary.open("w") as f:
+            json.dump(durations, f)
+        os.replace(temporary, self.path)
+        self._recorded = {}
+
+    def _default(self, section_name: str) -> float:
+        # Unknown packages are expected to take as long as an average known one
+        known = [s for package, s in self._durations.get(section_name, {}).items() if package != BATCH]
+        return sum(known) / len(known) if known else 0.0
+
+    def schedule(self, section_name: str, packages: list[str]) -> list[str]:
+        """Returns `packages` ordered longest expected first, unknown keep their order."""
+        default = self._default(section_name)
+
+        def key(package: str) -> float:
+            expected = self.expected(section_name, package)
+            return -(default if expected is None else expected)
+
+        return sorted(packages, key=key)
+
+    def estimate(self, section_name: str, packages: list[str], jobs: int, batch: bool) -> Estimate:
+        """Simulates scheduling of `packages` on `jobs` workers."""
+        if batch:
+            seconds = self.expected(section_name, BATCH)
+            return Estimate(packages, {BATCH: seconds}, packages, seconds or 0.0)
+        order = self.schedule(section_name, packages)
+        default = self._default(section_name)
+        durations = {package: self.expected(section_name, package) for package in order}
+        # (finish time, worker, packages of the worker)
+        workers: list[tuple[float, int, list[str]]] = [(0.0, worker, []) for worker in range(max(jobs, 1))]
+        for package in order:
+            finish, worker, assigned = heapq.heappop(workers)
+            duration = durations[package]
+            heapq.heappush(workers, (finish + (default if duration is None else duration), worker, assigned))
+            assigned.append(package)
+        seconds, _, critical_path = max(workers)
+        return Estimate(order, durations, critical_path, seconds)
@@ -0,0 +1,126 @@
+import json
+import os
+
+from collections import Counter
+from itertools import chain
+from pathlib import Path
+from typing import Iterable, Optional
+
+from vurf.nodes import If, Node, Package, Root
+
+
+INDEX_SUFFIX = ".index"
+
+Fingerprint = list[Optional[list[int]]]
+
+
+def fingerprint(*paths: Path) -> Fingerprint:
+    """Cheap identity of the files, changes whenever any of them is written."""
+    result: Fingerprint = []
+    for path in paths:
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            stat = None
+        # Missing and empty files hold the same data
+        if stat is None or not stat.st_size:
+            result.append(None)
+        else:
+            result.append([stat.st_ino, stat.st_mtime_ns, stat.st_size])
+    return result
+
+
+def _count(node: Node, in_branch: bool, counts: Counter, branched: set[str]) -> None:
+    # Same order as `get_all_packages`
+    for child in node.children:
+        if isinstance(child, Package):
+            counts[child.package_name] += 1
+            if in_branch:
+                branched.add(child.package_name)
+            continue
+        _count(child, in_branch, counts, branched)
+        if isinstance(child, If):
+            for branch in child.branches:
+                _count(branch, True, counts, branched)
+
+
+class Index:
+    """
+    Section and package names used by shell completion.
+
+    Mirrors the package API of `Root` so journal entries can be replayed over it.
+    Removing a package that occurs more than once in its section or inside elif or else
+    makes the index `stale`, the tree removes only some of the copies.
+    """
+
+    def __init__(self, sections: dict[str, list[str]], shared: Optional[dict[str, list[str]]] = None) -> None:
+        self.sections = sections
+        # Packages whose removal the index can't mirror
+        self.shared = shared if shared is not None else {section: [] for section in sections}
+        self.stale = False
+
+    @classmethod
+    def from_root(cls, root: Root) -> "Index":
+        sections, shared = {}, {}
+        for section_name, section in root._sections.items():
+            counts: Counter = Counter()
+            branched: set[str] = set()
+            _count(section, False, counts, branched)
+            sections[section_name] = list(counts)
+            shared[section_name] = [p for p, count in counts.items() if count > 1 or p in branched]
+        return cls(sections, shared)
+
+    @classmethod
+    def read(cls, path: Path, fingerprint: Fingerprint) -> Optional["Index"]:
+        """Returns index saved at `path` or `None` if it is missing or stale."""
+        try:
+            with path.open() as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if data.get("fingerprint") != fingerprint or "shared" not in data:
+            return None
+        return cls(data["sections"], data["shared"])
+
+    def write(self, path: Path, fingerprint: Fingerprint) -> None:
+        # Concurrent readers may rebuild the index at the same time
+        temporary = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        with temporary.open("w") as f:
+            json.dump({"fingerprint": fingerprint, "sections": self.sections, "shared": self.shared}, f)
+        os.replace(temporary, path)
+
+    def get_sections(self) -> Iterable[str]:
+        return self.sections.keys()
+
+    def has_section(self, section_name: str) -> bool:
+        return section_name in self.sections
+
+    def get_all_packages(self, section_name: Optional[str]) -> Iterable[str]:
+        if section_name is not None:
+            return self.sections[section_name]
+        else:
+            return chain.from_iterable(self.sections.values())
+
+    def add_section(self, section_name: str) -> None:
+        self.sections[section_name] = []
+        self.shared[section_name] = []
+
+    def remove_section(self, section_name: str) -> None:
+        del self.sections[section_name]
+        self.shared.pop(section_name, None)
+
+    def add_package(self, section_name: str, package_name: str) -> None:
+        package = Root._package(package_name).package_name
+        packages = self.sections[section_name]
+        if package not in packages:
+            packages.append(package)
+        elif package not in self.shared[section_name]:
+            # Tree adds another copy if the existing one is inside elif or else
+            self.shared[section_name].append(package)
+
+    def remove_package(self, section_name: str, package_name: str) -> None:
+        package = Root._package(package_name).package_name
+        if package in self.shared[section_name]:
+            self.stale = True
+            return
+        self.sections[section_name] = [p for p in self.sections[section_name] if p != package]
@@ -0,0 +1,237 @@
+import json
+import os
+import shutil
+
+from contextlib import contextmanager
+from pathlib import Path
+from typing import IO, Iterable, Iterator, Optional, TypeVar
+
+from vurf.index import INDEX_SUFFIX, Fingerprint, Index, fingerprint
+from vurf.nodes import NEWLINE, Root
+from vurf.types import Parameters
+
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover
+    # No advisory locking on Windows
+    fcntl = None  # type: ignore
+
+
+JOURNAL_SUFFIX = ".journal"
+
+ADD = "add"
+REMOVE = "remove"
+ADD_SECTION = "add_section"
+REMOVE_SECTION = "remove_section"
+
+Entry = tuple[str, ...]
+
+OPERATIONS = {
+    ADD: "add_package",
+    REMOVE: "remove_package",
+    ADD_SECTION: "add_section",
+    REMOVE_SECTION: "remove_section",
+}
+
+Replayable = TypeVar("Replayable", Root, Index)
+
+
+def replay(root: Replayable, entries: Iterable[Entry]) -> Replayable:
+    for operation, *args in entries:
+        try:
+            getattr(root, OPERATIONS[operation])(*args)
+        except (KeyError, ValueError, TypeError):
+            # Section was removed in the meantime or the entry is malformed
+            continue
+    return root
+
+
+class Journal:
+    """
+    Append-only log of mutations kept next to the packages file.
+
+    Writers append a single line under an exclusive advisory lock,
+    readers replay pending entries over the packages file under a shared lock
+    and `compact` folds the entries back into the packages file.
+    """
+
+    def __init__(self, packages_location: Path, threshold: int) -> None:
+        self.packages_location = packages_location
+        self.path = packages_location.with_name(packages_location.name + JOURNAL_SUFFIX)
+        self.index_path = packages_location.with_name(packages_location.name + INDEX_SUFFIX)
+        self.threshold = threshold
+
+    @contextmanager
+    def _locked(self, mode: str, exclusive: bool) -> Iterator[IO[str]]:
+        with self.path.open(mode) as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            # Closing the file releases the lock
+            yield f
+
+    @staticmethod
+    def _read(f: IO[str]) -> list[Entry]:
+        entries = []
+        for line in f:
+            try:
+                entries.append(tuple(json.loads(line)))
+            except ValueError:
+                # Torn line of a writer that crashed mid-write
+                continue
+        return entries
+
+    def _parse(self) -> Root:
+        # Importing the parser is the slowest part of completion which does not need it
+        from vurf.parser import parse
+
+        with self.packages_location.open() as f:
+            return parse(f)
+
+    def _write_index(self, index: Index, fingerprint: Fingerprint) -> None:
+        try:
+            index.write(self.index_path, fingerprint)
+        except OSError:
+            # Index is only a cache
+            pass
+
+    def fingerprint(self) -> Fingerprint:
+        return fingerprint(self.packages_location, self.path)
+
+    def entries(self) -> list[Entry]:
+        """Returns pending entries."""
+        if not self.path.is_file():
+            return []
+        with self._locked("r", exclusive=False) as f:
+            return self._read(f)
+
+    def load(self) -> Root:
+        """Parse the packages file and replay pending entries over it."""
+        if not self.path.is_file():
+            return self._parse()
+        with self._locked("r", exclusive=False) as f:
+            return replay(self._parse(), self._read(f))
+
+    def stream(self, parameters: Parameters, section_name: Optional[str] = None) -> Iterator[str]:
+        """
+        Yields resolved packages without building the tree.
+        Falls back to the tree if there are pending section changes
+        or the stream would differ from the tree (see `streamable`).
+        """
+        from vurf.parser.stream import stream_packages, streamable
+
+        if not self.path.is_file():
+            entries: list[Entry] = []
+            packages = self.packages_location.open()
+        else:
+            with self._locked("r", exclusive=False) as f:
+                entries = self._read(f)
+                # Compaction replaces the file, so the opened one stays consistent with the entries
+                packages = self.packages_location.open()
+        with packages:
+            packages_only = all(entry[0] in (ADD, REMOVE) and len(entry) == 3 for entry in entries)
+            if packages_only and streamable(packages, entries):
+                # Checked in a separate pass, the stream can't take back already yielded packages
+                packages.seek(0)
+                yield from stream_packages(packages, parameters, section_name, entries)
+                return
+        yield from self.load().get_packages(section_name, parameters)
+
+    def index(self) -> Index:
+        """Returns index of sections and packages, rebuilds it if it is stale."""
+        current = self.fingerprint()
+        index = Index.read(self.index_path, current)
+        if index is None:
+            # Fingerprint taken before loading, so a concurrent write only makes the index stale
+            index = Index.from_root(self.load())
+            self._write_index(index, current)
+        return index
+
+    def append(self, entries: Iterable[Entry]) -> int:
+        """
+        Appends `entries` in a single write.
+        Returns number of pending entries.
+        """
+        return self._append(entries)[0]
+
+    def _append(
+        self, entries: Iterable[Entry], root_fingerprint: Optional[Fingerprint] = None
+    ) -> tuple[int, Optional[Fingerprint]]:
+        """
+        Returns number of pending entries and fingerprint after the write
+        if the files had `root_fingerprint` before it, otherwise `None`.
+        """
+        entries = list(entries)
+        data = "".join(json.dumps(list(entry)) + NEWLINE for entry in entries)
+        with self._locked("a+", exclusive=True) as f:
+            before = self.fingerprint()
+            index = Index.read(self.index_path, before)
+            f.seek(0)
+            pending, last = 0, NEWLINE
+            for line in f:
+                pending, last = pending + 1, line[-1]
+            if data:
+                if last != NEWLINE:
+                    # Terminate torn line of a crashed writer so it doesn't swallow the first entry
+                    data = NEWLINE + data
+                f.write(data)
+                f.flush()
+            if index is not None:
+                # Keep fresh index fresh without parsing, stale one is rebuilt when needed
+                replay(index, entries)
+                if not index.stale:
+                    self._write_index(index, self.fingerprint())
+            if root_fingerprint is None or before != root_fingerprint:
+                return pending + len(entries), None
+            return pending + len(entries), self.fingerprint()
+
+    def record(
+        self,
+        entries: Iterable[Entry],
+        root: Optional[Root] = None,
+        root_fingerprint: Optional[Fingerprint] = None,
+    ) -> Optional[Fingerprint]:
+        """
+        Appends `entries` and compacts the journal when it grows past the threshold.
+        If the files had `root_fingerprint` that `root` with `entries` applied was loaded with,
+        returns fingerprint of the files `root` matches after the write, otherwise `None`.
+        """
+        pending, fingerprint = self._append(entries, root_fingerprint)
+        if pending > self.threshold:
+            # Up-to-date tree is rendered instead of parsing the files again
+            if fingerprint is None:
+                self.compact()
+                return None
+            return self.compact(root, fingerprint)[1]
+        return fingerprint
+
+    def compact(
+        self,
+        root: Optional[Root] = None,
+        root_fingerprint: Optional[Fingerprint] = None,
+        entries: Iterable[Entry] = (),
+    ) -> tuple[Root, Fingerprint]:
+        """
+        Folds pending entries and `entries` into the packages file.
+        Returns the up-to-date tree and fingerprint of the files it matches.
+        If the files still have `root_fingerprint` that `root` was loaded with, `root` with `entries` applied
+        is written as is, so only its changed sections are rendered again.
+        """
+        entries = list(entries)
+        with self._locked("a+", exclusive=True) as f:
+            if root is None or self.fingerprint() != root_fingerprint:
+                f.seek(0)
+                root = replay(replay(self._parse(), self._read(f)), entries)
+            # Replace the real file so symlinked packages files stay symlinks
+            target = self.packages_location.resolve()
+            temporary = target.with_name(f".{target.name}.tmp")
+            with temporary.open("w") as out:
+                out.write(root.to_string())
+            shutil.copymode(target, temporary)
+            os.replace(temporary, target)
+            f.truncate(0)
+            f.flush()
+            # Taken under the lock, so it matches the written tree
+            fingerprint = self.fingerprint()
+            self._write_index(Index.from_root(root), fingerprint)
+        return root, fingerprint
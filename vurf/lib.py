@@ -1,3 +1,5 @@
+import re
+
 from pathlib import Path
 from shutil import copyfile
 from typing import Any
@@ -5,12 +7,13 @@ from typing import Any
 import click
 import tomli
 
-from vurf.constants import APP_NAME, CONFIG_NAME
+from vurf.constants import APP_NAME, CONFIG_NAME, HISTORY_NAME, PREFETCH_NAME
 from vurf.types import Config, Section
 
 
 DEFAULTS_PATH = "defaults"
 DEFAULT_PACKAGES_NAME = "packages.vurf"
+REQUIREMENT_NAME = re.compile(r"^\s*([A-Za-z0-9][A-Za-z0-9._-]*)")
 
 
 def expand_path(filename: str) -> Path:
@@ -20,20 +23,52 @@ def expand_path(filename: str) -> Path:
     return path
 
 
+def unquote(name: str) -> str:
+    if len(name) > 1 and name[0] == name[-1] and name[0] in {'"', "'"}:
+        return name[1:-1]
+    return name
+
+
+def requirement_name(requirement: str) -> str:
+    """PEP 503 normalized project name of a requirement like `Click==8.0.0`."""
+    requirement = unquote(requirement)
+    match = REQUIREMENT_NAME.match(requirement)
+    return re.sub(r"[-_.]+", "-", match.group(1) if match else requirement).lower()
+
+
+def config_location() -> Path:
+    return Path(click.get_app_dir(APP_NAME)) / CONFIG_NAME
+
+
+def history_location() -> Path:
+    return Path(click.get_app_dir(APP_NAME)) / HISTORY_NAME
+
+
+def prefetch_location() -> Path:
+    return Path(click.get_app_dir(APP_NAME)) / PREFETCH_NAME
+
+
+def load_config(config_file: Path) -> Config:
+    with config_file.open("rb") as opened:
+        config = tomli.load(opened)
+    # Transform sections
+    sections = {section["name"]: Section(**section) for section in config.pop("sections")}
+    return Config(**config, sections=sections)
+
+
 def ensure_config(quiet: bool) -> Config:
-    config_path = Path(click.get_app_dir(APP_NAME))
+    config_file = config_location()
+    config_path = config_file.parent
     if not config_path.exists():
         config_path.mkdir(parents=True)
-    config_file = config_path / CONFIG_NAME
     default_packages_file = Path.home() / DEFAULT_PACKAGES_NAME
     if not config_file.is_file():
         if not quiet:
             click.secho("Config file not found...", fg="bright_black")
             click.secho(f"Creating default config {config_file}", fg="bright_black")
         copyfile(Path(__file__).parent / DEFAULTS_PATH / CONFIG_NAME, config_file)
-    with config_file.open("rb") as opened:
-        config = tomli.load(opened)
-    if not expand_path(config["packages_location"]).is_file():
+    config = load_config(config_file)
+    if not expand_path(config.packages_location).is_file():
         if not quiet:
             click.secho("Packages file not found...", fg="bright_black")
             click.secho(f"Creating default {default_packages_file}", fg="bright_black")
@@ -42,6 +77,4 @@ def ensure_config(quiet: bool) -> Config:
             Path(__file__).parent / DEFAULTS_PATH / DEFAULT_PACKAGES_NAME,
             default_packages_file,
         )
-    # Transform sections
-    sections = {section["name"]: Section(**section) for section in config.pop("sections")}
-    return Config(**config, sections=sections)
+    return config
@@ -1,30 +1,116 @@
 import sys
 
+from dataclasses import replace
+from io import StringIO
 from pathlib import Path
 from typing import Any, Iterable, Optional, Union
 import contextlib
 
-from vurf.lib import ensure_config, expand_path
-from vurf.parser import parse
-from vurf.types import Parameters, Sections
+from vurf.facts import Facts, using
+from vurf.history import History
+from vurf.index import Fingerprint
+from vurf.journal import ADD, ADD_SECTION, REMOVE, REMOVE_SECTION, Entry, Journal
+from vurf.lib import ensure_config, expand_path, history_location
+from vurf.nodes import Root
+from vurf.types import Config, Parameters, Sections
+
+
+DEFAULT_SECTION = "default"
 
 
 class Vurf:
-    def __init__(self) -> None:
-        self._config = ensure_config(quiet=True)
-        with self.packages_location.open() as f:
-            self._root = parse(f)
+    def __init__(self, config: Optional[Config] = None, root: Optional[Root] = None) -> None:
+        """
+        Reads config and packages file from disk, creates them if they don't exist.
+        Use `from_path` or `from_string` to skip that.
+        """
+        # Injected config is never re-read nor bootstrapped
+        self._bootstrap = config is None
+        self._config = config if config is not None else ensure_config(quiet=True)
+        # Install durations are only recorded for the config in the config directory
+        self._history = History(history_location() if self._bootstrap else None)
+        # Facts are collected once per instance and only seen by its own conditions
+        self._facts = Facts.from_config(self._config)
+        self._journal: Optional[Journal] = None
+        self._fingerprint: Optional[Fingerprint] = None
+        self._pending: list[Entry] = []
+        if root is None:
+            self.reload()
+        else:
+            self._root = root
+
+    @classmethod
+    def from_path(cls, path: Union[str, Path], config: Optional[Config] = None) -> "Vurf":
+        """
+        Vurf backed by packages file at `path`.
+        Defaults to config without sections and parameters.
+        """
+        if config is None:
+            config = Config(str(path), DEFAULT_SECTION, {}, {})
+        return cls(replace(config, packages_location=str(path)))
+
+    @classmethod
+    def from_string(cls, packages: str, config: Optional[Config] = None) -> "Vurf":
+        """
+        In-memory Vurf that cannot be saved or reloaded.
+        Defaults to config without sections and parameters.
+        """
+        # Parser is imported lazily to keep shell completion fast
+        from vurf.parser import parse
+
+        if config is None:
+            config = Config("", DEFAULT_SECTION, {}, {})
+        # Packages file of the config is ignored, so nothing is written to it nor read from it
+        return cls(replace(config, packages_location=""), parse(StringIO(packages)))
 
     def reload(self) -> None:
-        """Reload data from disk."""
-        self._config = ensure_config(quiet=True)
-        with self.packages_location.open() as f:
-            self._root = parse(f)
+        """
+        Reload data from disk.
+        Packages file is parsed again only if it has changed or there are unsaved changes.
+        """
+        if self._bootstrap:
+            self._config = ensure_config(quiet=True)
+        journal = self._get_journal()
+        if self._journal is None or journal.packages_location != self._journal.packages_location:
+            self._fingerprint = None
+        self._journal = journal
+        # Taken before loading, so a concurrent write only causes another parse
+        fingerprint = journal.fingerprint()
+        if fingerprint != self._fingerprint or self._pending:
+            self._root = journal.load()
+            self._fingerprint = fingerprint
+            self._pending = []
+
+    def _get_journal(self) -> Journal:
+        if not self._config.packages_location:
+            raise ValueError("In-memory packages have no packages file")
+        return Journal(self.packages_location, self._config.journal_threshold)
 
     def save(self) -> None:
-        """Save contents to disk."""
-        with self.packages_location.open("w") as f:
-            f.write(self._root.to_string())
+        """Save changes to disk."""
+        journal = self._journal or self._get_journal()
+        if self._pending:
+            # Own writes keep the tree up to date, so reload and format don't parse the file again
+            self._fingerprint = journal.record(self._pending, self._root, self._fingerprint)
+            self._pending = []
+
+    def format(self) -> None:
+        """Save changes and format packages file."""
+        journal = self._journal or self._get_journal()
+        # Unchanged files let the journal render this tree instead of parsing them again
+        self._root, self._fingerprint = journal.compact(self._root, self._fingerprint, self._pending)
+        self._pending = []
+
+    def snapshot(self) -> Root:
+        """
+        Returns read-only tree of packages.
+        It shares unchanged sections with this instance and can be read from other threads without locks.
+        """
+        return self._root.snapshot()
+
+    def to_string(self) -> str:
+        """Returns formatted packages file."""
+        return self._root.to_string()
 
     @property
     def packages_location(self) -> Path:
@@ -49,8 +135,10 @@ class Vurf:
         """
         if isinstance(packages, str):
             packages = [packages]
+        section = section or self.default_section
         for package in packages:
-            self._root.add_package(section or self.default_section, package)
+            self._root.add_package(section, package)
+            self._pending.append((ADD, section, package))
 
     def remove(self, packages: Union[str, Iterable[str]], section: Optional[str] = None) -> None:
         """
@@ -59,20 +147,30 @@ class Vurf:
         """
         if isinstance(packages, str):
             packages = [packages]
+        section = section or self.default_section
         for package in packages:
-            self._root.remove_package(section or self.default_section, package)
+            self._root.remove_package(section, package)
+            self._pending.append((REMOVE, section, package))
 
-    def has(self, package: str, section: Optional[str] = None) -> bool:
+    def has(self, package: str, section: Optional[str] = None, resolved: bool = False) -> bool:
         """
         Returns True if `package` is in `section`.
         Defaults to all sections.
+        With `resolved` only packages included by conditions count.
         """
+        if resolved:
+            with using(self._facts):
+                return self._root.has_resolved_package(section, package, self.config_parameters)
         return self._root.has_package(section, package)
 
-    def package_section(self, package: str) -> Optional[str]:
+    def package_section(self, package: str, resolved: bool = False) -> Optional[str]:
         """
         Returns section of a `package` or `None` if there is none.
+        With `resolved` only packages included by conditions count.
         """
+        if resolved:
+            with using(self._facts):
+                return self._root.get_resolved_package_section(package, self.config_parameters)
         return self._root.get_package_section(package)
 
     def packages(self, section: Optional[str] = None) -> list[str]:
@@ -80,7 +178,8 @@ class Vurf:
         Returns list of packages in `section`.
         Defaults to all sections.
         """
-        return list(self._root.get_packages(section, self.config_parameters))
+        with using(self._facts):
+            return list(self._root.get_packages(section, self.config_parameters))
 
     def sections(self) -> list[str]:
         """Returns list of sections."""
@@ -97,26 +196,41 @@ class Vurf:
         Adds new `section`.
         """
         self._root.add_section(section)
+        self._pending.append((ADD_SECTION, section))
 
     def remove_section(self, section: str) -> None:
         """
         Removes `section` from sections.
         """
         self._root.remove_section(section)
+        self._pending.append((REMOVE_SECTION, section))
 
     def install(self, section: Optional[str] = None) -> None:
         """
         Run install commands on packages in `section`.
         Defaults to all sections.
         """
-        self._root.install(section, self.config_sections, self.config_parameters)
+        try:
+            with using(self._facts):
+                self._root.install(section, self.config_sections, self.config_parameters, self._history)
+        finally:
+            self._history.save()
+
+    def plan(self, section: Optional[str] = None) -> dict[str, list[str]]:
+        """
+        Returns packages that install would install by section.
+        Defaults to all sections.
+        """
+        with using(self._facts):
+            return self._root.plan(section, self.config_sections, self.config_parameters)
 
     def uninstall(self, section: Optional[str] = None) -> None:
         """
         Run uninstall commands on packages in `section`.
         Defaults to all sections.
         """
-        self._root.install(section, self.config_sections, self.config_parameters)
+        with using(self._facts):
+            self._root.install(section, self.config_sections, self.config_parameters)
 
     @classmethod
     @contextlib.contextmanager
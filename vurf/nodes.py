@@ -1,3 +1,4 @@
+import copy
 import functools
 import operator
 import os
@@ -8,6 +9,9 @@ from functools import cached_property, partial
 from itertools import chain
 from typing import Callable, Iterable, Optional, Union, cast
 
+from vurf.backends import get_backend
+from vurf.facts import current
+from vurf.history import History
 from vurf.types import Parameters, Sections
 
 
@@ -16,13 +20,21 @@ COMMENT = "#"
 ELLIPSIS = "..."
 NEWLINE = "\n"
 
+# Conditions on the path from a package to its section with their required values
+Guards = tuple[tuple["EvaluableMixin", bool], ...]
+
 
 class Node:
+    # Leaves are cheaper to render than to cache
+    _cache_rendered = True
+
     def __init__(self, data: str, children: Optional[list["Node"]] = None) -> None:
         self.data = data
         if children is None:
             children = []
         self.children = children
+        # (indent, text) of the last rendering, reset when the subtree changes
+        self._rendered: Optional[tuple[int, str]] = None
 
     def __str__(self) -> str:
         return self.data
@@ -34,6 +46,14 @@ class Node:
         return isinstance(other, self.__class__) and self.data == other.data
 
     def to_string(self, indent=0) -> str:
+        if self._rendered is not None and self._rendered[0] == indent:
+            return self._rendered[1]
+        rendered = self._render(indent)
+        if self._cache_rendered:
+            self._rendered = (indent, rendered)
+        return rendered
+
+    def _render(self, indent: int) -> str:
         indented = f"{INDENT * indent}{self}"
         return NEWLINE.join(chain((indented,), (child.to_string(indent + 1) for child in self.children)))
 
@@ -45,16 +65,22 @@ class Node:
             self.children.append(node)
         else:
             self.children[indexes[0]].add_child(node, *indexes[1:])
+        self._rendered = None
 
-    def remove_child(self, node: "Node") -> None:
+    def remove_child(self, node: "Node") -> bool:
+        """Returns True if the subtree has changed."""
         if node in self.children:
             self.children = [child for child in self.children if child != node]
             # Add ellipsis to empty withs and ifs
             if isinstance(self, (With, If, Elif, Else)) and not self.children:
                 self.add_child(Ellipsis_(ELLIPSIS))
+            changed = True
         else:
-            for child in self.children:
-                child.remove_child(node)
+            # Not short-circuiting, the node is removed from all children
+            changed = any([child.remove_child(node) for child in self.children])
+        if changed:
+            self._rendered = None
+        return changed
 
     def has_child(self, node: "Node") -> bool:
         if node in self.children:
@@ -64,14 +90,22 @@ class Node:
     def get_packages(self, parameters: Parameters) -> Iterable[str]:
         return chain.from_iterable(child.get_packages(parameters) for child in self.children)
 
+    def get_all_packages(self) -> Iterable[str]:
+        """Packages regardless of conditions."""
+        return chain.from_iterable(child.get_all_packages() for child in self.children)
+
 
 class Comment(Node):
+    _cache_rendered = False
+
     @classmethod
     def from_parsed(cls, data) -> "Comment":
         return cls(data[0].value)
 
 
 class Package(Node):
+    _cache_rendered = False
+
     def __init__(self, data: str, comment: Optional["Comment"] = None) -> None:
         if data[0] == data[-1] and data[0] in {'"', "'"}:
             self._quoted = True
@@ -101,6 +135,9 @@ class Package(Node):
     def get_packages(self, _: Parameters) -> Iterable[str]:
         return [self.package_name]
 
+    def get_all_packages(self) -> Iterable[str]:
+        return [self.package_name]
+
 
 class With(Node):
     @classmethod
@@ -112,11 +149,16 @@ class With(Node):
         return f"with {self.data}:"
 
 
+def evaluate(condition: str, parameters: Parameters) -> bool:
+    namespace = {"os": os, "pathlib": pathlib, "subprocess": subprocess, "facts": current()}
+    return bool(eval(condition, namespace, parameters))
+
+
 class EvaluableMixin:
     data: str = "THIS IS FOR MIXIN TYPING TO WORK"
 
     def eval(self, parameters: Parameters) -> bool:
-        return bool(eval(self.data, {"os": os, "pathlib": pathlib, "subprocess": subprocess}, parameters))
+        return evaluate(self.data, parameters)
 
 
 class If(Node, EvaluableMixin):
@@ -141,6 +183,9 @@ class If(Node, EvaluableMixin):
                 packages.append(branch.get_packages(parameters))
         return chain.from_iterable(packages)
 
+    def get_all_packages(self) -> Iterable[str]:
+        return chain(super().get_all_packages(), *(branch.get_all_packages() for branch in self.branches))
+
     @classmethod
     def from_parsed(cls, data) -> "If":
         arg, body = data[0], data[1]
@@ -149,10 +194,10 @@ class If(Node, EvaluableMixin):
     def __str__(self) -> str:
         return f"if {self.data}:"
 
-    def to_string(self, indent=0) -> str:
+    def _render(self, indent: int) -> str:
         return NEWLINE.join(
             chain(
-                (super().to_string(indent=indent),),
+                (super()._render(indent),),
                 (branch.to_string(indent) for branch in self.branches),
             )
         )
@@ -175,11 +220,25 @@ class Else(Node):
 
 
 class Ellipsis_(Node):
+    _cache_rendered = False
+
     @classmethod
     def from_parsed(cls, data) -> "Ellipsis_":
         return cls(data[0].value)
 
 
+def _locate(node: Node, guards: Guards, locations: dict[str, list[Guards]]) -> None:
+    for child in node.children:
+        if isinstance(child, Package):
+            locations.setdefault(child.data, []).append(guards)
+        elif isinstance(child, If):
+            _locate(child, guards + ((child, True),), locations)
+            for branch in child.branches:
+                # Elif is included by its own condition, else by the condition of the if
+                guard = (branch, True) if isinstance(branch, Elif) else (child, False)
+                _locate(branch, guards + (guard,), locations)
+
+
 class Root:
     """
     Public API
@@ -191,20 +250,31 @@ class Root:
         * remove_section(str) -> None
     # Packages
         * get_packages(Optional[str], Parameters) -> Iterable[str]
+        * get_all_packages(Optional[str]) -> Iterable[str]
         * has_package(Optional[str], str) -> bool
         * get_package_section(str) -> Optional[str]
+        * has_resolved_package(Optional[str], str, Parameters) -> bool
+        * get_resolved_package_section(str, Parameters) -> Optional[str]
         * add_package(str, str) -> None
         * remove_package(str, str) -> None
     # Commands
-        * install(Optional[str], Sections, Parameters) -> None
-        * uninstall(Optional[str], Sections, Parameters) -> None
+        * install(Optional[str], Sections, Parameters, Optional[History]) -> None
+        * uninstall(Optional[str], Sections, Parameters, Optional[History]) -> None
+        * plan(Optional[str], Sections, Parameters) -> dict[str, list[str]]
+    # Snapshots
+        * snapshot() -> Root
 
     """
 
-    def __init__(self, children: Optional[list["Node"]] = None) -> None:
+    def __init__(self, children: Optional[list["Node"]] = None, read_only: bool = False) -> None:
         if children is None:
             children = []
         self._children = children
+        self._read_only = read_only
+        # Ids of sections shared with snapshots, they are copied before the first change
+        self._shared: set[int] = set()
+        # Section -> package -> guards of its occurrences, built on the first resolved query
+        self._locations: Optional[dict[str, dict[str, list[Guards]]]] = None
         self.install = partial(self._exec, operator.attrgetter("install"))
         self.uninstall = partial(self._exec, operator.attrgetter("uninstall"))
 
@@ -222,7 +292,29 @@ class Root:
     def _sections(self) -> dict[str, With]:
         return {child.data: child for child in self._children if isinstance(child, With)}
 
-    def _package(self, package_name: str) -> Package:
+    def _check_writable(self) -> None:
+        if self._read_only:
+            raise TypeError("Snapshot is read-only")
+
+    def _writable_section(self, section_name: str) -> With:
+        self._check_writable()
+        section = self._sections[section_name]
+        if id(section) in self._shared:
+            self._shared.discard(id(section))
+            index = next(i for i, child in enumerate(self._children) if child is section)
+            section = self._children[index] = copy.deepcopy(section)
+        return section
+
+    def snapshot(self) -> "Root":
+        """
+        Returns read-only copy that shares sections with this tree.
+        Sections are copied on the first change so the snapshot never changes.
+        """
+        self._shared = {id(child) for child in self._children}
+        return self.__class__(list(self._children), read_only=True)
+
+    @staticmethod
+    def _package(package_name: str) -> Package:
         if COMMENT in package_name:
             index = package_name.index(COMMENT)
             name = package_name[:index]
@@ -239,10 +331,15 @@ class Root:
         return section_name in self._sections
 
     def add_section(self, section_name: str) -> None:
+        self._check_writable()
         self._children.append(With(section_name, [Ellipsis_(ELLIPSIS)]))
+        self._locations = None
 
     def remove_section(self, section_name: str) -> None:
-        self._children.remove(With(section_name))
+        self._check_writable()
+        section = self._children.pop(self._children.index(With(section_name)))
+        self._shared.discard(id(section))
+        self._locations = None
 
     def get_packages(self, section_name: Optional[str], parameters: Parameters) -> Iterable[str]:
         if section_name is not None:
@@ -252,6 +349,12 @@ class Root:
                 section.get_packages(parameters) for section in self._sections.values()
             )
 
+    def get_all_packages(self, section_name: Optional[str]) -> Iterable[str]:
+        if section_name is not None:
+            return self._sections[section_name].get_all_packages()
+        else:
+            return chain.from_iterable(section.get_all_packages() for section in self._sections.values())
+
     def has_package(self, section_name: Optional[str], package_name: str) -> bool:
         package = self._package(package_name)
         if section_name is not None:
@@ -266,34 +369,84 @@ class Root:
                 return section_name
         return None
 
+    def _get_locations(self) -> dict[str, dict[str, list[Guards]]]:
+        if self._locations is None:
+            self._locations = {}
+            for section_name, section in self._sections.items():
+                _locate(section, (), self._locations.setdefault(section_name, {}))
+        return self._locations
+
+    def _resolves(
+        self, section_name: str, package: Package, parameters: Parameters, evaluated: dict[int, bool]
+    ) -> bool:
+        for guards in self._get_locations()[section_name].get(package.data, []):
+            for node, expected in guards:
+                # Conditions shared by several occurrences are evaluated once
+                if id(node) not in evaluated:
+                    evaluated[id(node)] = node.eval(parameters)
+                if evaluated[id(node)] != expected:
+                    break
+            else:
+                return True
+        return False
+
+    def has_resolved_package(
+        self, section_name: Optional[str], package_name: str, parameters: Parameters
+    ) -> bool:
+        """
+        Like `has_package` but only for packages that `get_packages` returns.
+        Evaluates only conditions on the paths to occurrences of the package.
+        """
+        package = self._package(package_name)
+        evaluated: dict[int, bool] = {}
+        if section_name is not None:
+            return self._resolves(section_name, package, parameters, evaluated)
+        return any(self._resolves(name, package, parameters, evaluated) for name in self._sections)
+
+    def get_resolved_package_section(self, package_name: str, parameters: Parameters) -> Optional[str]:
+        package = self._package(package_name)
+        evaluated: dict[int, bool] = {}
+        for section_name in self._sections:
+            if self._resolves(section_name, package, parameters, evaluated):
+                return section_name
+        return None
+
     def add_package(self, section_name: str, package_name: str, *indexes: int) -> None:
         """
         Note: AFAIK `indexes` are unused
         but can be used to add packages to different sub-sections (if/else) inside section
         """
         package = self._package(package_name)
-        self._sections[section_name].add_child(package, *indexes)
+        self._writable_section(section_name).add_child(package, *indexes)
+        self._locations = None
 
     def remove_package(self, section_name: str, package_name: str) -> None:
         package = self._package(package_name)
-        self._sections[section_name].remove_child(package)
+        self._writable_section(section_name).remove_child(package)
+        self._locations = None
+
+    def plan(
+        self, section_name: Optional[str], sections: Sections, parameters: Parameters
+    ) -> dict[str, list[str]]:
+        """Returns packages that install would install by section."""
+        section_names = [section_name] if section_name is not None else list(self._sections)
+        return {
+            name: get_backend(sections[name]).plan(list(self._sections[name].get_packages(parameters)))
+            for name in section_names
+        }
 
     def _exec(
         self,
-        get_command: Callable[..., str],
+        get_action: Callable[..., Callable[[list[str]], None]],
         section_name: Optional[str],
         sections: Sections,
         parameters: Parameters,
+        history: Optional[History] = None,
     ) -> None:
         if section_name is not None:
-            packages = self._sections[section_name].get_packages(parameters)
-            command = get_command(sections[section_name])
-            if sections[section_name].sequential:
-                for package in packages:
-                    subprocess.run(f"{command} {package}", shell=True)
-            else:
-                subprocess.run(f"{command} {' '.join(packages)}", shell=True)
+            packages = list(self._sections[section_name].get_packages(parameters))
+            get_action(get_backend(sections[section_name], history))(packages)
             return
         else:
             for section in self._sections:
-                self._exec(get_command, section, sections, parameters)
+                self._exec(get_action, section, sections, parameters, history)
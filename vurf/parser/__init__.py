@@ -1,7 +1,6 @@
 import sys
 
-from io import TextIOWrapper
-from typing import cast
+from typing import TextIO, cast
 
 from vurf.nodes import Root
 from vurf.parser.indenter import PythonesqueIndenter
@@ -9,7 +8,7 @@ from vurf.parser.stand_alone import Lark_StandAlone, ParseError
 from vurf.parser.transformer import Root, VurfTransformer
 
 
-def parse(file: TextIOWrapper) -> Root:
+def parse(file: TextIO) -> Root:
     parser = Lark_StandAlone(
         postlex=PythonesqueIndenter(),
         transformer=VurfTransformer(),
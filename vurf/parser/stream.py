@@ -0,0 +1,262 @@
+"""
+Streaming resolution of packages for files too large to build the whole tree.
+
+The file is read line by line and only the stack of open blocks is kept,
+so memory is bounded by nesting depth instead of file size.
+Packages are yielded as soon as their block is known to be active,
+conditions of inactive blocks are never evaluated.
+"""
+import re
+
+from dataclasses import dataclass
+from itertools import count
+from typing import Iterable, Iterator, Optional
+
+from vurf.journal import REMOVE, Entry
+from vurf.nodes import COMMENT, ELLIPSIS, Package, Root, evaluate
+from vurf.parser.indenter import PythonesqueIndenter
+from vurf.types import Parameters
+
+
+QUOTED_PACKAGE = re.compile(r"""("(?:[^"\\]|\\.)*"|'(?:[^'\\]|\\.)*')""")
+PACKAGE = re.compile(r"[^.# \t\f\r\n][^# \t\f\r\n]*")
+ROOT, WITH, IF, ELIF, ELSE = "root", "with", "if", "elif", "else:"
+# Statements that aren't blocks
+PACKAGE_, END = "package", "end"
+
+# States of a package changed by journal entries
+REMOVED, APPENDED, APPENDED_IF_MISSING = range(3)
+
+Statement = tuple[str, str, int]
+
+
+@dataclass
+class _Frame:
+    kind: str
+    header_indent: int
+    # Indentation of the children, known from the first one
+    indent: Optional[int] = None
+    # Last closed child was an if or elif, so elif and else can follow
+    after_if: bool = False
+
+
+@dataclass
+class _Block:
+    kind: str
+    active: bool
+    # Packages inside elif/else are not visible to `remove_package` and `has_package` of the tree
+    in_branch: bool = False
+    section: str = ""
+    # Value of the condition of an if
+    value: bool = False
+    # Value of the last closed if, else uses it
+    if_value: bool = False
+
+
+class _Overlay:
+    """Applies `add` and `remove` journal entries without building the tree."""
+
+    def __init__(self, entries: Iterable[Entry]) -> None:
+        self._states: dict[str, dict[str, int]] = {}
+        self._order: dict[str, dict[str, int]] = {}
+        self._packages: dict[tuple[str, str], str] = {}
+        self._seen: dict[str, set[str]] = {}
+        counter = count()
+        for operation, section, package_name in entries:
+            package = Root._package(package_name)
+            states = self._states.setdefault(section, {})
+            state = states.get(package.data)
+            if operation == REMOVE:
+                states[package.data] = REMOVED
+            elif state is None or state == REMOVED:
+                # Added package goes to the end of the section, unless it is already there
+                states[package.data] = APPENDED_IF_MISSING if state is None else APPENDED
+                self._order.setdefault(section, {})[package.data] = next(counter)
+                self._packages[section, package.data] = package.package_name
+
+    def visible(self, section: str, package: Package, in_branch: bool) -> bool:
+        state = self._states.get(section, {}).get(package.data)
+        if state is None or in_branch:
+            return True
+        if state == APPENDED_IF_MISSING:
+            self._seen.setdefault(section, set()).add(package.data)
+            return True
+        return False
+
+    def appended(self, section: str) -> list[str]:
+        states = self._states.get(section, {})
+        seen = self._seen.pop(section, set())
+        order = self._order.get(section, {})
+        return [
+            self._packages[section, name]
+            for name in sorted(order, key=order.__getitem__)
+            if states[name] == APPENDED or (states[name] == APPENDED_IF_MISSING and name not in seen)
+        ]
+
+
+def _indentation(line: str) -> tuple[int, str]:
+    content = line.lstrip(" \t")
+    whitespace = line[: len(line) - len(content)]
+    return whitespace.count(" ") + whitespace.count("\t") * PythonesqueIndenter.tab_len, content.rstrip()
+
+
+def _package(content: str) -> str:
+    match = QUOTED_PACKAGE.match(content) or PACKAGE.match(content)
+    if match is None:
+        raise ValueError(f"Invalid package {content}")
+    rest = content[match.end() :].strip()
+    if rest and not rest.startswith(COMMENT):
+        raise ValueError(f"Unexpected {rest}")
+    return match.group(0)
+
+
+def _statements(lines: Iterable[str]) -> Iterator[Statement]:
+    """
+    Yields `(kind, argument, line number)` of blocks, packages and `END` of every block.
+    Comments and ellipses are skipped.
+    """
+    stack = [_Frame(ROOT, -1, indent=0)]
+
+    def close(number: int) -> Statement:
+        frame = stack.pop()
+        stack[-1].after_if = frame.kind in (IF, ELIF)
+        return END, "", number
+
+    def statement(content: str, number: int) -> Iterator[Statement]:
+        parent = stack[-1]
+        # Indentation of the parent's children is known by now
+        indent = parent.indent or 0
+        keyword = re.split(r"[\s#]", content, maxsplit=1)[0]
+        if keyword in (ELIF, ELSE):
+            if not parent.after_if:
+                raise ValueError(f"Line {number}: {keyword} without if")
+        else:
+            parent.after_if = False
+        if content.startswith(COMMENT) or content == ELLIPSIS:
+            return
+        if keyword in (WITH, IF, ELIF, ELSE):
+            if (keyword == WITH) != (parent.kind == ROOT):
+                raise ValueError(f"Line {number}: unexpected {keyword}")
+            rest = content[len(keyword) :]
+            argument = ""
+            if keyword != ELSE:
+                if ":" not in rest:
+                    raise ValueError(f"Line {number}: expected :")
+                argument, rest = rest.split(":", 1)
+                argument = argument.lstrip()
+            body = rest.strip()
+            if body.startswith(COMMENT):
+                # Grammar has no comments after the colon of a block
+                raise ValueError(f"Line {number}: unexpected comment")
+            frame = _Frame(keyword, indent)
+            stack.append(frame)
+            yield keyword, argument, number
+            if body:
+                # Inline body like `with pip: package`
+                frame.indent = frame.header_indent + 1
+                yield from statement(body, number)
+                yield close(number)
+            return
+        if parent.kind == ROOT:
+            raise ValueError(f"Line {number}: package outside of section")
+        try:
+            package = _package(content)
+        except ValueError as e:
+            raise ValueError(f"Line {number}: {e}") from None
+        yield PACKAGE_, package, number
+
+    number = 0
+    for number, line in enumerate(lines, start=1):
+        indent, content = _indentation(line)
+        if not content:
+            continue
+        while True:
+            top = stack[-1]
+            if top.indent is None:
+                if indent <= top.header_indent:
+                    raise ValueError(f"Line {number}: expected an indented block")
+                top.indent = indent
+            if indent == top.indent:
+                break
+            if indent > top.indent:
+                raise ValueError(f"Line {number}: unexpected indent")
+            yield close(number)
+        yield from statement(content, number)
+    while len(stack) > 1:
+        if stack[-1].indent is None:
+            raise ValueError("Unexpected end of file, expected an indented block")
+        yield close(number)
+
+
+def streamable(lines: Iterable[str], entries: Iterable[Entry] = ()) -> bool:
+    """
+    Returns False if `stream_packages` would differ from the tree, which happens when
+    a section is repeated (the tree keeps only the last one) or a package changed by `entries`
+    occurs in more than one block of its section (the tree removes only the shallowest copies).
+    """
+    pending = {(section, Root._package(package_name).data) for _, section, package_name in entries}
+    sections: set[str] = set()
+    parents: dict[tuple[str, str], int] = {}
+    # (block id, in elif/else)
+    stack: list[tuple[int, bool]] = []
+    section = ""
+    for block, (kind, argument, _) in enumerate(_statements(lines)):
+        if kind == WITH:
+            if argument in sections:
+                return False
+            sections.add(argument)
+            section = argument
+            stack.append((block, False))
+        elif kind in (IF, ELIF, ELSE):
+            stack.append((block, stack[-1][1] or kind != IF))
+        elif kind == END:
+            stack.pop()
+        elif pending:
+            key = section, Package(argument).data
+            parent, in_branch = stack[-1]
+            if key in pending and not in_branch and parents.setdefault(key, parent) != parent:
+                return False
+    return True
+
+
+def stream_packages(
+    lines: Iterable[str],
+    parameters: Parameters,
+    section_name: Optional[str] = None,
+    entries: Iterable[Entry] = (),
+) -> Iterator[str]:
+    """
+    Yields packages of `section_name` (defaults to all sections) the same way as `Root.get_packages`.
+    `entries` are `add` and `remove` journal entries replayed over the file.
+    Check the file with `streamable` first.
+    """
+    overlay = _Overlay(entries)
+    stack = [_Block(ROOT, True)]
+    found = section_name is None
+    for kind, argument, _ in _statements(lines):
+        parent = stack[-1]
+        if kind == END:
+            block = stack.pop()
+            if block.kind == IF:
+                stack[-1].if_value = block.value
+            elif block.kind == WITH and block.active:
+                yield from overlay.appended(block.section)
+        elif kind == PACKAGE_:
+            package = Package(argument)
+            # Overlay sees packages of inactive blocks too, they count as present for `add`
+            if overlay.visible(parent.section, package, parent.in_branch) and parent.active:
+                yield package.package_name
+        elif kind == WITH:
+            active = section_name is None or argument == section_name
+            found = found or active
+            stack.append(_Block(WITH, active, section=argument))
+        elif kind == IF:
+            value = parent.active and evaluate(argument, parameters)
+            stack.append(_Block(IF, value, parent.in_branch, parent.section, value))
+        elif kind == ELIF:
+            active = parent.active and evaluate(argument, parameters)
+            stack.append(_Block(ELIF, active, True, parent.section))
+        else:
+            stack.append(_Block(ELSE, parent.active and not parent.if_value, True, parent.section))
+    if not found:
+        raise KeyError(section_name)
@@ -0,0 +1,67 @@
+import os
+import stat
+import subprocess
+import sys
+
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from itertools import islice
+from pathlib import Path
+from typing import Iterable, Iterator, cast
+
+from vurf.lib import prefetch_location
+from vurf.types import Section
+
+
+CACHE = "{cache}"
+
+
+def cache_location(section: Section) -> Path:
+    """
+    Private directory of the section in the app directory.
+    Packages from it are installed, so it must not be writable by anyone else.
+    """
+    path = prefetch_location() / section.name
+    path.mkdir(mode=0o700, parents=True, exist_ok=True)
+    status = path.lstat()
+    if stat.S_ISLNK(status.st_mode) or (hasattr(os, "getuid") and status.st_uid != os.getuid()):
+        raise PermissionError(f"Prefetch cache {path} is not owned by the current user")
+    if stat.S_IMODE(status.st_mode) & 0o077:
+        path.chmod(0o700)
+    return path
+
+
+def with_cache(command: str, section: Section) -> str:
+    """Replaces `{cache}` placeholder, other braces are left for the shell."""
+    if CACHE not in command:
+        return command
+    return command.replace(CACHE, str(cache_location(section)))
+
+
+def _prefetch(command: str, package: str) -> bool:
+    result = subprocess.run(f"{command} {package}", shell=True, capture_output=True)
+    if result.returncode:
+        sys.stderr.write(f"Prefetch of {package} failed, installing it anyway\n")
+    return not result.returncode
+
+
+def prefetched(section: Section, packages: Iterable[str]) -> Iterator[str]:
+    """
+    Yields `packages` in order once their prefetch has finished.
+    Prefetches run on a pool of `prefetch_jobs` threads at most `prefetch_jobs` packages ahead,
+    so downloads of the next packages overlap with the install of the yielded one.
+    """
+    command = with_cache(cast(str, section.prefetch), section)
+    remaining = iter(packages)
+    with ThreadPoolExecutor(max_workers=section.prefetch_jobs) as executor:
+        futures: deque[tuple[str, Future]] = deque(
+            (package, executor.submit(_prefetch, command, package))
+            for package in islice(remaining, section.prefetch_jobs)
+        )
+        while futures:
+            package, future = futures.popleft()
+            # Failed prefetch is only reported, install falls back to downloading
+            future.result()
+            for following in islice(remaining, 1):
+                futures.append((following, executor.submit(_prefetch, command, following)))
+            yield package
@@ -1,5 +1,5 @@
-from dataclasses import dataclass
-from typing import Union
+from dataclasses import dataclass, field
+from typing import Optional, Union
 
 
 @dataclass
@@ -8,10 +8,17 @@ class Section:
     install: str = "echo No install command provided, packages:"
     uninstall: str = "echo No uninstall command provided, packages:"
     sequential: bool = False
+    jobs: int = 1
+    prefetch: Optional[str] = None
+    prefetch_jobs: int = 4
+    backend: str = "shell"
+    # Interpreter whose pip the "pip" backend uses
+    python: Optional[str] = None
 
 
 Sections = dict[str, Section]
 Parameters = dict[str, Union[str, int, float, bool]]
+Mappings = dict[str, list[str]]
 
 
 @dataclass
@@ -20,3 +27,7 @@ class Config:
     default_section: str
     sections: Sections
     parameters: Parameters
+    journal_threshold: int = 100
+    mappings: Mappings = field(default_factory=dict)
+    facts_snapshot: Optional[str] = None
+    facts_ttl: int = 3600